@@ -19,6 +19,8 @@ experiments = [
     # "case_studies/grid_42/450_steps/config.toml",
     # "case_studies/grid_42/500_steps/config.toml"
     ]
+# or run the whole benchmark suite (python scripts/benchmark_suite.py benchmark_suite.toml)
+# include("case_studies/benchmark/experiments.jl")
 
 # "case_studies/stylized_EU/config.toml"
 # "case_studies/8_locations/config.toml"
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the scripts import each other as top level modules, so the scripts folder itself has to be on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+main()
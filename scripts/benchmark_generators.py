@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+import profiling
+from generate_case_study_chain import create_chain_case_study
+from generate_case_study_cliques import create_clique_case_study
+from generate_case_study_grid import generate
+from generate_case_study_star import create_star_case_study
+
+# Throughput benchmark of the case study generators. Every generator is run for a ladder of sizes in a scratch
+# directory, the rows written per second (best of a few repeats) are compared to a saved baseline and the script
+# exits with 1 if a case got slower than the tolerance allows. Run it from the repository root:
+#   python scripts/benchmark_generators.py --save-baseline      (once, on the reference commit)
+#   python scripts/benchmark_generators.py                      (after a change)
+#   python scripts/benchmark_generators.py --profile stages.json  (also dump the per stage profile of every case)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PROFILE_FILES = ('sun_distribution.csv', 'profile_library.npz')
+TIME_STEPS = 168
+
+# generator: (sizes in number of locations, function that generates case study 'bench' of a size)
+CASES = {
+    'chain': ([64, 512, 4096], lambda n, time_steps: create_chain_case_study('bench', n, time_steps, seed=0)),
+    'star': ([57, 449, 3585], lambda n, time_steps: create_star_case_study('bench', 7, (n - 1) // 7, time_steps, seed=0)),
+    'cliques': ([64, 512, 2048], lambda n, time_steps: create_clique_case_study('bench', n, 8, time_steps, 0.9)),
+    'grid': ([16, 64, 256], lambda n, time_steps: generate(time_steps, 8760, n, 0, name='bench')),
+}
+
+
+def count_rows(folder):
+    "number of data rows in all csv files under folder"
+    rows = 0
+    for directory, _, files in os.walk(folder):
+        for file in files:
+            if file.endswith('.csv'):
+                with open(os.path.join(directory, file), 'rb') as f:
+                    rows += sum(1 for _ in f) - 1
+    return rows
+
+
+def run_case(generator, n, time_steps=TIME_STEPS, repeat=3):
+    """
+    generates the case in a fresh scratch directory repeat times
+
+    returns the best wall time and the number of rows written
+    """
+    generate_case = CASES[generator][1]
+    cwd = os.getcwd()
+    best = float('inf')
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as scratch:
+            for profile_file in PROFILE_FILES:
+                if os.path.exists(os.path.join(ROOT, profile_file)):
+                    shutil.copy(os.path.join(ROOT, profile_file), scratch)
+            os.chdir(scratch)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = perf_counter()
+                    generate_case(n, time_steps)
+                    best = min(best, perf_counter() - start)
+                rows = count_rows('case_studies')
+            finally:
+                os.chdir(cwd)
+    return best, rows
+
+
+def run(generators=None, time_steps=TIME_STEPS, repeat=3):
+    results = {}
+    for generator, (sizes, _) in CASES.items():
+        if generators is not None and generator not in generators:
+            continue
+        for n in sizes:
+            seconds, rows = run_case(generator, n, time_steps, repeat)
+            results[f'{generator}/{n}'] = {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    "prints every case next to its baseline and returns the cases that are more than tolerance slower"
+    regressions = []
+    print(f"{'case':>16} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'baseline':>12} {'change':>8}")
+    for case, result in results.items():
+        line = f"{case:>16} {result['rows']:>10} {result['seconds']:>9.3f} {result['rows_per_second']:>12.0f}"
+        if case in baseline:
+            change = result['rows_per_second'] / baseline[case]['rows_per_second'] - 1
+            line += f" {baseline[case]['rows_per_second']:>12.0f} {change:>+8.1%}"
+            if change < -tolerance:
+                regressions.append(case)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+def profile(generators=None, time_steps=TIME_STEPS, path=None):
+    "generates every case once more with profiling on and dumps the per stage records"
+    profiling.enable()
+    records = []
+    for generator, (sizes, _) in CASES.items():
+        if generators is not None and generator not in generators:
+            continue
+        for n in sizes:
+            run_case(generator, n, time_steps, repeat=1)
+            records.extend({**record, 'case': f'{generator}/{n}'} for record in profiling.take())
+    profiling.dump(path, records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='rows per second of the case study generators')
+    parser.add_argument('--baseline', default='results/generator_benchmark.json', help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--time-steps', type=int, default=TIME_STEPS)
+    parser.add_argument('--generators', nargs='*', choices=list(CASES))
+    parser.add_argument('--profile', metavar='JSON', help='also dump the per stage profile of every case')
+    args = parser.parse_args()
+
+    results = run(args.generators, args.time_steps, args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.profile:
+        profile(args.generators, args.time_steps, args.profile)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f'saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} cases are more than {args.tolerance:.0%} slower than the baseline')
+        sys.exit(1)
@@ -0,0 +1,186 @@
+import html
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from results_index import collect, runs
+
+# Benchmark report of the full versus the reduced model, built from the results.csv files of main.jl.
+# An instance is one experiment folder, the runs of an instance are resampled to get bootstrap confidence intervals.
+# Older results.csv files have no n column (results_index takes their time steps from the folder name), so the runs
+# of those experiments have no size and are left out of the report with a printed warning.
+
+INSTANCE_COLUMNS = ['experiment', 'n', 'time_steps']
+
+
+def bootstrap_ratio(numerator, denominator, rng, samples=2000, confidence=0.95):
+    """
+    bootstrap confidence interval of mean(numerator) / mean(denominator), both resampled with replacement
+
+    returns (estimate, low, high)
+    """
+    numerator, denominator = np.asarray(numerator), np.asarray(denominator)
+    estimate = numerator.mean() / denominator.mean()
+    if len(numerator) < 2 and len(denominator) < 2:
+        return estimate, np.nan, np.nan
+    ratios = (
+        rng.choice(numerator, size=(samples, len(numerator))).mean(axis=1) /
+        rng.choice(denominator, size=(samples, len(denominator))).mean(axis=1)
+    )
+    low, high = np.quantile(ratios, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return estimate, low, high
+
+
+def compare_instances(df, seed=0, samples=2000):
+    """
+    speedup (full runtime / reduced runtime) and objective gap ((reduced - full) / full) per instance,
+    with bootstrap confidence intervals over the runs. Instances without both a full and a reduced run, or without
+    n or time_steps, are skipped.
+    """
+    unknown = df[INSTANCE_COLUMNS].isna().any(axis=1)
+    if unknown.any():
+        experiments = sorted(df.loc[unknown, 'experiment'].unique())
+        print(f"warning: skipping {len(experiments)} experiments without n or time_steps in their results.csv "
+              f"(older main.jl output): {', '.join(experiments[:5])}{', ...' if len(experiments) > 5 else ''}")
+    df = df[~unknown].astype({'n': int, 'time_steps': int})
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for key, instance in df.groupby(INSTANCE_COLUMNS):
+        full = instance[~instance['reduction']]
+        reduced = instance[instance['reduction']]
+        if full.empty or reduced.empty:
+            continue
+        speedup = bootstrap_ratio(full['runtime'], reduced['runtime'], rng, samples)
+        objective_ratio = bootstrap_ratio(reduced['objective'], full['objective'], rng, samples)
+        rows.append({
+            **dict(zip(INSTANCE_COLUMNS, key)),
+            'size': key[1] * key[2],
+            'runs': len(full),
+            'full_runtime': full['runtime'].mean(),
+            'reduced_runtime': reduced['runtime'].mean(),
+            'speedup': speedup[0],
+            'speedup_low': speedup[1],
+            'speedup_high': speedup[2],
+            'objective_gap': objective_ratio[0] - 1,
+            'objective_gap_low': objective_ratio[1] - 1,
+            'objective_gap_high': objective_ratio[2] - 1,
+        })
+    return pd.DataFrame(rows)
+
+
+def fit_scaling(comparison, runtime_column):
+    """
+    fits runtime = c * n^a * time_steps^b by least squares on the log of the mean runtime per instance
+
+    A size dimension without variation between the instances is left out of the fit (its exponent is nan).
+    returns a dict with the exponents, the constant and the r squared
+    """
+    y = np.log(comparison[runtime_column].to_numpy())
+    columns = {'n': np.log(comparison['n'].to_numpy()), 'time_steps': np.log(comparison['time_steps'].to_numpy())}
+    varying = [name for name, x in columns.items() if np.ptp(x) > 0]
+    fit = {f'{name}_exponent': np.nan for name in columns}
+    if len(y) < len(varying) + 1 or not varying:
+        return {**fit, 'constant': np.nan, 'r_squared': np.nan}
+
+    X = np.column_stack([np.ones(len(y))] + [columns[name] for name in varying])
+    coefficients, *_ = np.linalg.lstsq(X, y, rcond=None)
+    residuals = y - X @ coefficients
+    total = np.sum((y - y.mean()) ** 2)
+    for name, coefficient in zip(varying, coefficients[1:]):
+        fit[f'{name}_exponent'] = coefficient
+    return {**fit, 'constant': np.exp(coefficients[0]), 'r_squared': 1 - np.sum(residuals ** 2) / total if total else np.nan}
+
+
+def plot_speedup(comparison, path):
+    comparison = comparison.sort_values('size')
+    fig, ax = plt.subplots(figsize=(8, 5))
+    error = [comparison['speedup'] - comparison['speedup_low'], comparison['speedup_high'] - comparison['speedup']]
+    ax.errorbar(comparison['size'], comparison['speedup'], yerr=np.nan_to_num(error), fmt='o', capsize=3)
+    ax.axhline(1, color='grey', linestyle='--')
+    ax.set_xscale('log')
+    ax.set_xlabel('Locations x time steps')
+    ax.set_ylabel('Speedup (full / reduced runtime)')
+    ax.set_title('Speedup of the spatial reduction')
+    ax.grid(True)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_objective_gap(comparison, path):
+    comparison = comparison.sort_values('size')
+    fig, ax = plt.subplots(figsize=(8, 5))
+    error = [comparison['objective_gap'] - comparison['objective_gap_low'], comparison['objective_gap_high'] - comparison['objective_gap']]
+    ax.errorbar(comparison['size'], 100 * comparison['objective_gap'], yerr=100 * np.nan_to_num(error), fmt='o', capsize=3)
+    ax.axhline(0, color='grey', linestyle='--')
+    ax.set_xscale('log')
+    ax.set_xlabel('Locations x time steps')
+    ax.set_ylabel('Objective gap (%)')
+    ax.set_title('Objective of the reduced versus the full model')
+    ax.grid(True)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_scaling(comparison, fits, path):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for label, column in (('Full', 'full_runtime'), ('Reduced', 'reduced_runtime')):
+        ax.loglog(comparison['size'], comparison[column], 'o', label=f"{label} (n^{fits[label]['n_exponent']:.2f}, "
+                                                                    f"T^{fits[label]['time_steps_exponent']:.2f})")
+    ax.set_xlabel('Locations x time steps')
+    ax.set_ylabel('Runtime')
+    ax.set_title('Runtime scaling')
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def write_report(root='./results', output_folder=None, experiment=None, seed=0, samples=2000):
+    """
+    writes speedup.png, objective_gap.png, scaling.png, comparison.csv and report.html to output_folder
+    (default {root}/report) and returns the per instance comparison and the scaling fits
+    """
+    if output_folder is None:
+        output_folder = os.path.join(root, 'report')
+    os.makedirs(output_folder, exist_ok=True)
+
+    connection, _ = collect(root)
+    comparison = compare_instances(runs(connection, experiment), seed, samples)
+    assert not comparison.empty, "no instance with n and time_steps has both a full and a reduced run"
+    fits = {
+        'Full': fit_scaling(comparison, 'full_runtime'),
+        'Reduced': fit_scaling(comparison, 'reduced_runtime'),
+    }
+
+    comparison.to_csv(os.path.join(output_folder, 'comparison.csv'), index=False)
+    plot_speedup(comparison, os.path.join(output_folder, 'speedup.png'))
+    plot_objective_gap(comparison, os.path.join(output_folder, 'objective_gap.png'))
+    plot_scaling(comparison, fits, os.path.join(output_folder, 'scaling.png'))
+
+    with open(os.path.join(output_folder, 'report.html'), 'w') as f:
+        f.write(f"""<html><head><title>Spatial reduction benchmark</title></head><body>
+<h1>Spatial reduction benchmark</h1>
+<p>{len(comparison)} instances from {html.escape(os.path.abspath(root))}, {samples} bootstrap samples.</p>
+<h2>Runtime scaling</h2>
+{pd.DataFrame(fits).T.to_html(float_format='{:.3f}'.format)}
+<img src="scaling.png">
+<h2>Speedup</h2>
+<img src="speedup.png">
+<h2>Objective gap</h2>
+<img src="objective_gap.png">
+<h2>Instances</h2>
+{comparison.to_html(index=False, float_format='{:.4g}'.format)}
+</body></html>
+""")
+    return comparison, fits
+
+
+if __name__ == '__main__':
+    comparison, fits = write_report()
+    print(comparison)
+    print(pd.DataFrame(fits).T)
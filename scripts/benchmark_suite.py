@@ -0,0 +1,167 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from time import perf_counter
+
+import toml
+
+import profiling
+from generate_case_study_chain import create_chain_case_study
+from generate_case_study_cliques import create_clique_case_study
+from generate_case_study_grid import generate
+from generate_case_study_star import create_star_case_study
+from technologies import TECHNOLOGIES
+from validate_case_study import validate_case_study
+
+# Declarative benchmark suite (see benchmark_suite.toml in the repository root): every family lists a generator,
+# the ladders of its parameters and the seeds. materialize() generates the cartesian product of every family in
+# parallel, validates every instance and writes the experiments list for main.jl. Run it from the repository root.
+
+GENERATORS = ('chain', 'star', 'cliques', 'grid')
+
+
+def load_suite(path):
+    suite = toml.load(path)
+    for family in suite['families']:
+        assert family['generator'] in GENERATORS, f"unknown generator {family['generator']}, expected one of {GENERATORS}"
+    return suite
+
+
+def expand_family(family, root, yeartime, mixes):
+    """
+    all instances of a family as (generator, kwargs, config path) in a fixed order
+
+    The instance name holds all its parameters, so every instance has its own folder in case_studies/{root}/{family}.
+    """
+    folder = f"{root}/{family['name']}"
+    generator = family['generator']
+    instances = []
+
+    if generator == 'chain':
+        for n, time_steps, seed in product(family['nodes'], family['time_steps'], family['seeds']):
+            name = f'{folder}/{n}_{time_steps}_{seed}'
+            instances.append((generator, dict(name=name, n=n, time_steps=time_steps, seed=seed),
+                              f'case_studies/{name}/config.toml'))
+
+    elif generator == 'star':
+        for chain_length, degrees, time_steps, seed in product(
+                family['chain_lengths'], family['degrees'], family['time_steps'], family['seeds']):
+            name = f'{folder}/{chain_length}_{degrees}_{time_steps}_{seed}'
+            instances.append((generator, dict(name=name, chain_length=chain_length, degrees=degrees,
+                                              time_steps=time_steps, seed=seed),
+                              f'case_studies/{name}/config.toml'))
+
+    elif generator == 'cliques':
+        for n, clique_size, time_steps, alpha, mix, seed in product(
+                family['nodes'], family['clique_sizes'], family['time_steps'],
+                family['bound_alpha_factors'], family.get('mixes', ['all']), family['seeds']):
+            assert n % clique_size == 0, f"{family['name']}: {n} nodes can not be split in cliques of {clique_size}"
+            assert mix == 'all' or mix in mixes, f"{family['name']}: unknown technology mix {mix}"
+            name = f'{folder}/{n}_{clique_size}_{time_steps}_{alpha}_{mix}_{seed}'
+            instances.append((generator, dict(name=name, n=n, clique_size=clique_size, time_steps=time_steps,
+                                              bound_alpha_factor=alpha, seed=seed,
+                                              technology_mix=None if mix == 'all' else mixes[mix]),
+                              f'case_studies/{name}/config.toml'))
+
+    elif generator == 'grid':
+        for gridsize, time_steps, seed in product(family['nodes'], family['time_steps'], family['seeds']):
+            side = round(gridsize ** 0.5)
+            assert side * side == gridsize and side & (side - 1) == 0 and gridsize >= 4, \
+                f"{family['name']}: a grid needs a power of 4 nodes, got {gridsize}"
+            name = f'{folder}/{gridsize}_{seed}'
+            instances.append((generator, dict(time=time_steps, yeartime=yeartime, gridsize=gridsize, seed=seed,
+                                              name=name),
+                              f'case_studies/{name}/{time_steps}_steps/config.toml'))
+
+    return instances
+
+
+def expand_suite(suite):
+    mixes = suite.get('mixes', {})
+    for mix in mixes.values():
+        assert set(mix) <= set(TECHNOLOGIES), f"unknown technologies {set(mix) - set(TECHNOLOGIES)}"
+    return [
+        instance
+        for family in suite['families']
+        for instance in expand_family(family, suite['root'], suite.get('yeartime', 8760), mixes)
+    ]
+
+
+def _materialize_instance(job):
+    "generates one instance and validates it, returns the seconds of the generation, its profile and the errors"
+    generator, kwargs, config = job
+    start = perf_counter()
+    if generator == 'chain':
+        create_chain_case_study(**kwargs)
+    elif generator == 'star':
+        create_star_case_study(**kwargs)
+    elif generator == 'cliques':
+        create_clique_case_study(**kwargs)
+    else:
+        generate(**kwargs)
+    elapsed = perf_counter() - start
+    return elapsed, profiling.take(), validate_case_study(os.path.dirname(config))['errors']
+
+
+def write_experiments(path, configs):
+    "writes the experiments list in the syntax of main.jl, so main.jl can include(path) it"
+    with open(path, 'w') as f:
+        f.write('experiments = [\n')
+        f.writelines(f'    "{config}",\n' for config in configs)
+        f.write(']\n')
+
+
+def materialize(suite_path, workers=None, families=None):
+    """
+    generates every instance of the suite in parallel (instances that are up to date are skipped by the generators)
+    and writes case_studies/{root}/experiments.jl and case_studies/{root}/suite_manifest.json
+
+    Every instance is checked with validate_case_study, instances with errors are left out of experiments.jl.
+
+    inputs:
+        suite_path: [string]        path of the suite toml
+        workers:    [int]           number of processes, default the number of cpus
+        families:   [list]          names of the families to materialize, default all
+    """
+    suite = load_suite(suite_path)
+    if families is not None:
+        suite['families'] = [family for family in suite['families'] if family['name'] in families]
+    instances = expand_suite(suite)
+    root = f"case_studies/{suite['root']}"
+    os.makedirs(root, exist_ok=True)
+
+    manifest = []
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_materialize_instance, instance): instance for instance in instances}
+        for done, future in enumerate(as_completed(futures), 1):
+            generator, kwargs, config = futures[future]
+            elapsed, profile, errors = future.result()
+            print(f'[{done}/{len(instances)}] {config} generated in {elapsed:.2f}s')
+            for error in errors:
+                print(f'    error: {error}')
+            manifest.append({'config': config, 'generator': generator, **kwargs, 'seconds': elapsed})
+            if profile:
+                manifest[-1]['profile'] = profile
+            if errors:
+                manifest[-1]['errors'] = errors
+
+    invalid = {entry['config'] for entry in manifest if 'errors' in entry}
+    configs = [config for _, _, config in instances if config not in invalid]
+    order = {config: i for i, (_, _, config) in enumerate(instances)}
+    manifest.sort(key=lambda entry: order[entry['config']])
+    write_experiments(f'{root}/experiments.jl', configs)
+    with open(f'{root}/suite_manifest.json', 'w') as f:
+        json.dump({'suite': toml.load(suite_path), 'instances': manifest}, f, indent=2)
+    print(f'generated {len(instances)} instances in {perf_counter() - start:.2f}s, experiments: {root}/experiments.jl')
+    if invalid:
+        print(f'left {len(invalid)} invalid instances out of the experiments, see the errors above')
+    if profiling.enabled():
+        profiling.dump(records=[record for entry in manifest for record in entry.get('profile', [])])
+    return configs
+
+
+if __name__ == '__main__':
+    materialize(sys.argv[1] if len(sys.argv) > 1 else 'benchmark_suite.toml')
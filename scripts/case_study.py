@@ -0,0 +1,190 @@
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import toml
+
+from columnar import INDEX, load_columnar
+
+# Loader for the inputs of a case study folder. CaseStudy reads the config.toml and resolves the [input.data] file
+# names, the input frames are only read when they are used. Reads can be filtered on a time window, locations and
+# technologies and restricted to some columns; the CSV is then read in chunks and only the selected rows are kept.
+# Parsed files are memoized per process by (path, mtime, filters), so analysing the same case study again does not
+# parse its files again, and a regenerated file is read anew.
+#
+#   case = CaseStudy('case_studies/8_locations')
+#   case.demand                                              the whole demand.csv
+#   case.read('demand', time_steps=(1, 168), locations=['BEL', 'NED'])
+
+CHUNK_SIZE = 1_000_000
+# number of parsed (and filtered) files kept in the memo, the least recently used is dropped first
+MEMO_SIZE = 32
+_memo = OrderedDict()
+
+
+class CaseStudy:
+    """
+    the config and lazily read inputs of the case study in folder
+
+    The frames are shared with the memo, they are returned as shallow copies so adding or replacing columns
+    is fine, but do not change values in place.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.config_path = os.path.join(folder, 'config.toml')
+        self.config = toml.load(self.config_path)
+        self.data_config = self.config['input']['data']
+        self.sets_config = self.config['input']['sets']
+        self.input_folder = os.path.join(folder, self.data_config['dir'])
+
+    def __repr__(self):
+        return f'CaseStudy({self.folder!r})'
+
+    def path(self, key):
+        "path of the input file of key, e.g. 'demand' or 'scalars'"
+        return os.path.join(self.input_folder, self.data_config[key])
+
+    def exists(self, key):
+        return key in self.data_config and os.path.exists(self.path(key))
+
+    @property
+    def bidirectional(self):
+        return self.data_config['line_capacities_bidirectional']
+
+    @property
+    def clusters(self):
+        return self.data_config.get('clusters')
+
+    @property
+    def scalars(self):
+        return toml.load(self.path('scalars'))
+
+    @property
+    def demand(self):
+        return self.read('demand')
+
+    @property
+    def availability(self):
+        return self.read('generation_availability')
+
+    @property
+    def generation(self):
+        return self.read('generation')
+
+    @property
+    def lines(self):
+        return self.read('transmission_lines')
+
+    def read(self, key, time_steps=None, locations=None, technologies=None, columns=None):
+        """
+        reads the input file of key, keeping only the selected rows and columns
+
+        inputs:
+            time_steps:     [tuple]     (first, last) time step, both included
+            locations:      [list]      only these locations, transmission lines need both ends in them
+            technologies:   [list]      only these technologies
+            columns:        [list]      only these columns (the filters may use others)
+        A filter that does not apply to the file (e.g. time_steps for generation) is ignored.
+        """
+        path = self.path(key)
+        return read_csv(
+            path,
+            time_steps=None if time_steps is None else tuple(int(t) for t in time_steps),
+            locations=None if locations is None else frozenset(map(str, locations)),
+            technologies=None if technologies is None else frozenset(map(str, technologies)),
+            columns=None if columns is None else tuple(columns),
+        )
+
+    def dense(self, key, time_steps=None, locations=None):
+        """
+        the dense array of a case study written with output_format='columnar' (demand or generation_availability),
+        memory-mapped, so only the selected locations and time window are read from disk
+        """
+        data = load_columnar(self.input_folder)
+        index = data['index']
+        array = data[key]
+        if time_steps is not None:
+            steps = np.asarray(index['time_steps'])
+            selected = np.flatnonzero((steps >= time_steps[0]) & (steps <= time_steps[1]))
+            array = array[..., selected[0]:selected[-1] + 1] if len(selected) else array[..., :0]
+        if locations is not None:
+            position = {location: i for i, location in enumerate(index['locations'])}
+            array = array[[position[location] for location in locations]]
+        return array
+
+    @property
+    def columnar(self):
+        "whether the inputs were written in the columnar format (see columnar.py)"
+        return os.path.exists(os.path.join(self.input_folder, INDEX))
+
+    @property
+    def index(self):
+        "the labels of the dense arrays of a columnar case study"
+        with open(os.path.join(self.input_folder, INDEX)) as f:
+            return json.load(f)
+
+
+def read_csv(path, time_steps=None, locations=None, technologies=None, columns=None):
+    """
+    reads the CSV at path with the filters of CaseStudy.read, memoized on the modification time of the file
+
+    When the whole file is already in the memo, the selection is taken from it instead of reading the file again.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    key = (path, mtime, time_steps, locations, technologies, columns)
+    if key not in _memo:
+        whole = (path, mtime, None, None, None, None)
+        if whole in _memo:
+            frame = _select(_memo[whole], time_steps, locations, technologies, columns)
+        else:
+            frame = _read_csv(path, time_steps, locations, technologies, columns)
+        _memo[key] = frame
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    _memo.move_to_end(key)
+    return _memo[key].copy(deep=False)
+
+
+def _read_csv(path, time_steps, locations, technologies, columns):
+    header = pd.read_csv(path, encoding='utf-8-sig', nrows=0).columns
+    usecols = None
+    if columns is not None:
+        filtered = [column for column in ('time_step', 'location', 'technology', 'from', 'to') if column in header]
+        usecols = [column for column in header if column in columns or column in filtered]
+
+    if (time_steps, locations, technologies) == (None, None, None):
+        frame = pd.read_csv(path, encoding='utf-8-sig', usecols=usecols)
+    else:
+        frames = [_select(chunk, time_steps, locations, technologies, None)
+                  for chunk in pd.read_csv(path, encoding='utf-8-sig', usecols=usecols, chunksize=CHUNK_SIZE)]
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.read_csv(path, encoding='utf-8-sig',
+                                                                                 usecols=usecols, nrows=0)
+    if columns is not None:
+        frame = frame[[column for column in frame.columns if column in columns]]
+    return frame
+
+
+def _select(frame, time_steps, locations, technologies, columns):
+    "the rows of frame in the time window, at the locations and of the technologies, and then only columns"
+    keep = np.ones(len(frame), dtype=bool)
+    if time_steps is not None and 'time_step' in frame:
+        keep &= frame['time_step'].between(*time_steps).to_numpy()
+    if locations is not None:
+        for column in ('location', 'from', 'to'):
+            if column in frame:
+                keep &= frame[column].astype(str).isin(locations).to_numpy()
+    if technologies is not None and 'technology' in frame:
+        keep &= frame['technology'].astype(str).isin(technologies).to_numpy()
+    frame = frame[keep] if not keep.all() else frame
+    if columns is not None:
+        frame = frame[[column for column in frame.columns if column in columns]]
+    return frame.reset_index(drop=True)
+
+
+def clear_cache():
+    "forgets every memoized file"
+    _memo.clear()
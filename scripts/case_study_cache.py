@@ -0,0 +1,54 @@
+import hashlib
+import json
+import os
+
+# manifest with the input hash of every generated artifact, stored next to the config.toml of a case study
+MANIFEST = 'cache_manifest.json'
+
+
+def fingerprint(*parts):
+    "hashes any combination of json serializable generator parameters (tuples, lists, dicts, numbers, strings)"
+    encoded = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def fingerprint_files(*paths):
+    "hashes the content of files, e.g. the generator source and the data files it reads"
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_manifest(folder):
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def stale_artifacts(folder, keys):
+    """
+    returns the set of artifacts that have to be (re)generated
+
+    inputs:
+        folder: [string]    case study folder
+        keys:   [dict]      artifact path (relative to folder) -> fingerprint of everything it is generated from
+
+    An artifact is stale when it does not exist or when its stored fingerprint differs.
+    """
+    manifest = load_manifest(folder)
+    return {
+        artifact for artifact, key in keys.items()
+        if manifest.get(artifact) != key or not os.path.exists(os.path.join(folder, artifact))
+    }
+
+
+def update_manifest(folder, keys):
+    "records the fingerprints of freshly written artifacts, call this only after writing them"
+    manifest = load_manifest(folder)
+    manifest.update(keys)
+    with open(os.path.join(folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
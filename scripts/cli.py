@@ -0,0 +1,275 @@
+import argparse
+import os
+import sys
+
+# Command line entry point of the scripts, run from the repository root as
+#   python -m scripts <command> [options]
+# Every command imports the modules it needs only when it runs, so that pandas, networkx and matplotlib are not
+# loaded for commands that do not use them and a driver calling the CLI many times starts fast.
+
+
+def ladder(value):
+    "an int, or a python style range start:stop[:step]"
+    if ':' in value:
+        return list(range(*map(int, value.split(':'))))
+    return [int(value)]
+
+
+def flatten(ladders):
+    return [value for values in ladders for value in values]
+
+
+def chain(args):
+    from generate_case_study_chain import create_chain_case_study
+    create_chain_case_study(args.name or f'{args.n}_chain', args.n, args.time_steps, args.seed, args.compress)
+
+
+def star(args):
+    from generate_case_study_star import create_star_case_study
+    create_star_case_study(args.name or f'{args.chain_length}_{args.degrees}_star',
+                           args.chain_length, args.degrees, args.time_steps, args.seed, args.compress)
+
+
+def cliques(args):
+    from generate_case_study_cliques import create_clique_case_study
+    name = args.name or f'cliques/{args.n}_{args.clique_size}_{args.time_steps}_{args.bound_alpha_factor}'
+    create_clique_case_study(name, args.n, args.clique_size, args.time_steps, args.bound_alpha_factor, args.seed,
+                             args.format, args.technologies, args.correlation_length, args.compress)
+    print(f'    "case_studies/{name}/config.toml",')
+
+
+def grid(args):
+    from generate_case_study_grid import generate
+    path = generate(args.time_steps, args.yeartime, args.gridsize, args.seed, name=args.name, output_format=args.format,
+                    compress=args.compress)
+    print(f'    "{os.path.normpath(path)}/config.toml",')
+
+
+def sweep(args):
+    from generate_case_study_grid import sweep
+    sweep(flatten(args.time_steps), args.yeartime, flatten(args.gridsizes), flatten(args.seeds), args.root_seed,
+          args.workers, args.manifest, args.compress)
+
+
+def suite(args):
+    from benchmark_suite import materialize
+    materialize(args.suite, args.workers, args.families)
+
+
+def reduce(args):
+    from reduction import reduce_case_study
+    for config in reduce_case_study(args.folder, args.output_folder, args.weighted):
+        print(f'    "{config}",')
+
+
+def aggregate(args):
+    from temporal_aggregation import aggregate_case_study
+    config = aggregate_case_study(args.folder, args.k, args.period_length, args.output_folder, args.seed)
+    print(f'    "{config}",')
+
+
+def cluster(args):
+    from clustering import cluster_case_study
+    print(cluster_case_study(args.folder, args.group_size))
+
+
+def score(args):
+    import pandas as pd
+    from reduction_error import score_case_study
+    scores = score_case_study(args.folder, group_sizes=flatten(args.group_sizes))
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+        print(scores)
+    if args.output:
+        scores.to_csv(args.output, index=False)
+
+
+def directional(args):
+    from parse_transmission_lines_directional import convert_tree
+    converted = convert_tree(args.roots, args.workers, args.force)
+    print(f'{len(converted)} transmission_lines2.csv written')
+
+
+def validate(args):
+    from validate_case_study import validate_tree
+    reports = validate_tree(args.roots, args.workers, args.output)
+    if any(report['errors'] for report in reports):
+        sys.exit(1)
+
+
+def summarize(args):
+    import toml
+    from postprocess_outputs import summarize_outputs
+    for folder in args.folders:
+        print(toml.dumps(summarize_outputs(folder, args.output_folder)['summary']))
+
+
+def stats(args):
+    import pandas as pd
+    from results_index import collect, summary
+    connection, ingested = collect(args.results)
+    print(f'ingested {ingested} new results')
+    with pd.option_context('display.max_rows', None, 'display.width', None):
+        print(summary(connection, tuple(args.by), args.experiment))
+
+
+def plot(args):
+    if args.report:
+        from benchmark_report import write_report
+        write_report(args.results, args.output_folder, args.experiment)
+        print(f"report written to {args.output_folder or os.path.join(args.results, 'report')}")
+    else:
+        from parametric_grid_plot import plot_grid_results
+        plot_grid_results(args.results, args.experiment or '*_steps')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='python -m scripts', description='case study generation and analysis')
+    parser.add_argument('--profile', action='store_true', help='profile the generator stages (see profiling.py)')
+    parser.add_argument('--profile-output', metavar='JSON', help='also dump the profile records to this JSON file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_format(command):
+        command.add_argument('--format', choices=('csv', 'columnar'), default='csv', help='input file format')
+
+    def add_compress(command):
+        command.add_argument('--compress', action='store_true',
+                             help='gzip the csv inputs, main.jl can only read them after gunzip')
+
+    command = commands.add_parser('chain', help='chain of n locations')
+    command.add_argument('n', type=int)
+    command.add_argument('--time-steps', type=int, default=100)
+    command.add_argument('--seed', type=int)
+    command.add_argument('--name', help='folder in case_studies, default {n}_chain')
+    add_compress(command)
+    command.set_defaults(run=chain)
+
+    command = commands.add_parser('star', help='star of degrees chains around a center location')
+    command.add_argument('chain_length', type=int)
+    command.add_argument('degrees', type=int)
+    command.add_argument('--time-steps', type=int, default=100)
+    command.add_argument('--seed', type=int)
+    command.add_argument('--name', help='folder in case_studies, default {chain_length}_{degrees}_star')
+    add_compress(command)
+    command.set_defaults(run=star)
+
+    command = commands.add_parser('cliques', help='n locations in connected cliques of clique_size')
+    command.add_argument('n', type=int)
+    command.add_argument('clique_size', type=int)
+    command.add_argument('--time-steps', type=int, default=48)
+    command.add_argument('--bound-alpha-factor', type=float, default=0.9)
+    command.add_argument('--seed', type=int, default=42)
+    command.add_argument('--technologies', nargs='+', help='technology mix, default all technologies')
+    command.add_argument('--correlation-length', type=float,
+                         help='spatially correlated availability with this length in hops, default independent')
+    command.add_argument('--name', help='folder in case_studies, default cliques/{n}_{clique_size}_{time_steps}_{alpha}')
+    add_format(command)
+    add_compress(command)
+    command.set_defaults(run=cliques)
+
+    command = commands.add_parser('grid', help='square grid of gridsize locations (a power of 4)')
+    command.add_argument('gridsize', type=int)
+    command.add_argument('--time-steps', type=int, default=50)
+    command.add_argument('--yeartime', type=int, default=8760)
+    command.add_argument('--seed', type=int, default=42)
+    command.add_argument('--name', help='folder in case_studies, default grid_{seed}')
+    add_format(command)
+    add_compress(command)
+    command.set_defaults(run=grid)
+
+    command = commands.add_parser('sweep', help='grid instances for every time steps, gridsize and seed in parallel')
+    command.add_argument('--time-steps', type=ladder, nargs='+', default=[list(range(50, 1001, 50))],
+                         help='ints or ranges start:stop:step, default 50:1001:50')
+    command.add_argument('--gridsizes', type=ladder, nargs='+', default=[[16]])
+    command.add_argument('--seeds', type=ladder, nargs='+', default=[[600]])
+    command.add_argument('--root-seed', type=int, default=600)
+    command.add_argument('--yeartime', type=int, default=8760)
+    command.add_argument('--workers', type=int)
+    command.add_argument('--manifest', default='./case_studies/grid_sweep_manifest.json')
+    add_compress(command)
+    command.set_defaults(run=sweep)
+
+    command = commands.add_parser('suite', help='every instance of a benchmark suite in parallel')
+    command.add_argument('suite', nargs='?', default='benchmark_suite.toml')
+    command.add_argument('--families', nargs='+', help='only these families')
+    command.add_argument('--workers', type=int)
+    command.set_defaults(run=suite)
+
+    command = commands.add_parser('reduce', help='write the reduced case study of every level of the cluster tree')
+    command.add_argument('folder', help='case study folder with a config.toml')
+    command.add_argument('--output-folder', help='default {folder}/reduced')
+    command.add_argument('--weighted', action='store_true',
+                         help='average the availability and the generation over the original locations instead of '
+                              'taking the mean of the cluster means like reduction.jl')
+    command.set_defaults(run=reduce)
+
+    command = commands.add_parser('aggregate', help='reduce the horizon of a case study to k unweighted representative '
+                                                    'periods (the weights in periods.csv are not used by the model)')
+    command.add_argument('folder', help='case study folder with a config.toml')
+    command.add_argument('k', type=int, help='number of representative periods')
+    command.add_argument('--period-length', type=int, default=24, help='24 for days, 168 for weeks')
+    command.add_argument('--output-folder', help='default {folder}/aggregated/{k}x{period_length}')
+    command.add_argument('--seed', type=int, default=0)
+    command.set_defaults(run=aggregate)
+
+    command = commands.add_parser('cluster', help='build the cluster tree of a case study from its transmission graph')
+    command.add_argument('folder', help='case study folder with a config.toml')
+    command.add_argument('--group-size', type=int, default=2)
+    command.set_defaults(run=cluster)
+
+    command = commands.add_parser('score', help='estimate the reduction error of every level of cluster trees without solving')
+    command.add_argument('folder', help='case study folder with a config.toml')
+    command.add_argument('--group-sizes', type=ladder, nargs='+', default=[],
+                         help='also score the trees of the cluster command with these group sizes')
+    command.add_argument('--output', metavar='CSV', help='also write the scores to CSV')
+    command.set_defaults(run=score)
+
+    command = commands.add_parser('directional', help='write transmission_lines2.csv next to every transmission_lines.csv')
+    command.add_argument('roots', nargs='*', default=['case_studies'], help='folders to search, default case_studies')
+    command.add_argument('--workers', type=int)
+    command.add_argument('--force', action='store_true',
+                         help='also convert files whose output is newer than the input, hand-made outputs are kept')
+    command.set_defaults(run=directional)
+
+    command = commands.add_parser('validate', help='check the inputs of every case study before solving it')
+    command.add_argument('roots', nargs='*', default=['case_studies'], help='folders to search, default case_studies')
+    command.add_argument('--workers', type=int)
+    command.add_argument('--output', metavar='JSON', help='also write the reports with the file statistics to JSON')
+    command.set_defaults(run=validate)
+
+    command = commands.add_parser('summarize', help='capacity factors, congestion and loss of load of the outputs of main.jl')
+    command.add_argument('folders', nargs='+', help='case study folders with a config.toml and outputs')
+    command.add_argument('--output-folder', help='default {output dir}/summary of the case study')
+    command.set_defaults(run=summarize)
+
+    command = commands.add_parser('stats', help='summary of the results of main.jl')
+    command.add_argument('--results', default='./results')
+    command.add_argument('--by', nargs='+', default=['reduction', 'n', 'time_steps', 'bound_alpha_factor'])
+    command.add_argument('--experiment', help='GLOB pattern on the experiment folder name, e.g. "*_steps"')
+    command.set_defaults(run=stats)
+
+    command = commands.add_parser('plot', help='plot the results of main.jl')
+    command.add_argument('--results', default='./results')
+    command.add_argument('--experiment', help='GLOB pattern on the experiment folder name, default "*_steps" for the grid plots')
+    command.add_argument('--report', action='store_true', help='write the benchmark report instead of showing the grid plots')
+    command.add_argument('--output-folder', help='folder of the report, default {results}/report')
+    command.set_defaults(run=plot)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.profile or args.profile_output:
+        import profiling
+        profiling.enable(args.profile_output)
+    args.run(args)
+    # the parallel commands dump the records of their workers themselves
+    if (args.profile or args.profile_output) and args.command not in ('sweep', 'suite'):
+        import profiling
+        profiling.dump()
+
+
+if __name__ == '__main__':
+    # the scripts import each other as top level modules
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,182 @@
+import sys
+from math import ceil, log2
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+import toml
+
+from case_study import CaseStudy
+from dendrogram_index import build_dendrogram_index, get_levels, write_dendrogram_index
+from load_input_as_graph import graph_from_lines
+
+# Automatic cluster trees for any topology. The tree is built bottom up by agglomerative clustering on the
+# transmission graph: on every level the clusters are paired up along the heaviest edges of a matching, where an
+# edge weighs its capacity times the similarity of the demand/availability profiles at both ends. Dividing by the
+# product of the cluster sizes and capping the merged size at group_size keeps the tree balanced, every level at
+# least halves the number of clusters, and every level wraps all clusters in a list, so all locations end up at the
+# same depth as reduction.jl expects.
+
+
+def get_profiles(locations, demand=None, availability=None):
+    "per location feature vector of the standardized demand profile and the availability per technology and time step"
+    features = []
+    if demand is not None and len(demand):
+        profile = demand.pivot_table(index='location', columns='time_step', values='demand').reindex(locations)
+        profile = profile.to_numpy()
+        profile = (profile - np.nanmean(profile, axis=1, keepdims=True)) / (np.nanstd(profile, axis=1, keepdims=True) + 1e-9)
+        features.append(profile)
+    if availability is not None and len(availability):
+        profile = availability.pivot_table(index='location', columns=['technology', 'time_step'], values='availability')
+        features.append(profile.reindex(locations).to_numpy())
+    if not features:
+        return np.zeros((len(locations), 0))
+    return np.nan_to_num(np.hstack(features))
+
+
+def get_weights(graph, locations, profiles):
+    """
+    sparse symmetric matrix with capacity x profile similarity on every edge of the graph
+
+    The similarity is a gaussian kernel on the distance between the profiles of both ends,
+    scaled by the median distance over all edges.
+    """
+    capacity = sp.coo_array(nx.to_scipy_sparse_array(graph, nodelist=locations, weight='capacity'))
+    distance = np.sum((profiles[capacity.row] - profiles[capacity.col]) ** 2, axis=1)
+    scale = np.median(distance) if len(distance) and np.median(distance) > 0 else 1
+    similarity = np.exp(-distance / (2 * scale))
+    return sp.csr_array((capacity.data * similarity, (capacity.row, capacity.col)), shape=capacity.shape)
+
+
+def merge_level(weights, sizes, group_size):
+    """
+    merges the clusters of a level into groups of at most group_size clusters
+
+    Every round pairs up the groups along the heaviest size-normalized edges with a greedy maximum weight matching
+    (heaviest edge first, within a factor 2 of the optimal matching), so the pairs are chosen over the whole graph
+    and one hub cannot absorb its neighbors one at a time. Groups left without a partner (e.g. the leaves of a star)
+    are paired with each other, smallest first. Rounds repeat while groups still fit together, so every level at
+    least halves the number of clusters and the tree has a depth of O(log n).
+
+    returns the group index of every cluster
+    """
+    n = len(sizes)
+    upper = sp.triu(weights, k=1).tocoo()
+    group = np.arange(n)
+    while True:
+        members = np.bincount(group, minlength=n)
+        location_sizes = np.bincount(group, weights=sizes, minlength=n)
+
+        # the edges between the groups, parallel edges summed
+        a, b = group[upper.row], group[upper.col]
+        between = a != b
+        a, b = np.minimum(a[between], b[between]), np.maximum(a[between], b[between])
+        edges = sp.coo_array(sp.coo_array((upper.data[between], (a, b)), shape=(n, n)).tocsr())
+        fits = members[edges.row] + members[edges.col] <= group_size
+        rows, cols = edges.row[fits], edges.col[fits]
+        score = edges.data[fits] / (location_sizes[rows] * location_sizes[cols])
+
+        parent = np.arange(n)
+        matched = np.zeros(n, dtype=bool)
+        order = np.argsort(-score, kind='stable')
+        for row, col in zip(rows[order], cols[order]):
+            if not matched[row] and not matched[col]:
+                matched[row] = matched[col] = True
+                parent[col] = row
+
+        # groups without a partner are paired with each other, smallest first
+        unmatched = np.flatnonzero((members > 0) & ~matched & (members < group_size))
+        unmatched = unmatched[np.argsort(members[unmatched], kind='stable')]
+        while len(unmatched) > 1 and members[unmatched[0]] + members[unmatched[1]] <= group_size:
+            parent[unmatched[1]] = unmatched[0]
+            matched[unmatched[:2]] = True
+            unmatched = unmatched[2:]
+
+        if not matched.any():
+            return np.unique(group, return_inverse=True)[1]
+        group = parent[group]
+
+
+def create_clusters(graph, locations=None, demand=None, availability=None, group_size=2):
+    """
+    builds a balanced hierarchical cluster tree (the nested clusters list of config.toml) for any transmission graph
+
+    inputs:
+        graph:          [nx.Graph]      transmission graph with edge attribute 'capacity', see load_graph
+        locations:      [list]          locations in the tree, default all nodes of the graph
+        demand:         [DataFrame]     optional demand table, similar demand profiles are merged first
+        availability:   [DataFrame]     optional generation availability table, used like the demand
+        group_size:     [int]           maximum number of clusters merged into one cluster per level
+    """
+    assert group_size >= 2, f"group_size has to be at least 2 to merge clusters, got {group_size}"
+    if locations is None:
+        locations = sorted(graph.nodes)
+    weights = get_weights(graph, locations, get_profiles(locations, demand, availability))
+    sizes = np.ones(len(locations))
+    nodes = list(locations)
+
+    while len(nodes) > group_size:
+        groups = merge_level(weights, sizes, group_size)
+        new_nodes = [[] for _ in range(groups.max() + 1)]
+        for node, group in zip(nodes, groups):
+            new_nodes[group].append(node)
+
+        # contract the graph onto the new clusters
+        assignment = sp.csr_array((np.ones(len(groups)), (np.arange(len(groups)), groups)))
+        weights = (assignment.T @ weights @ assignment).tocsr()
+        weights.setdiag(0)
+        weights.eliminate_zeros()
+        sizes = np.bincount(groups, weights=sizes)
+        nodes = new_nodes
+
+    return nodes
+
+
+def cluster_case_study(folder, group_size=2):
+    """
+    builds the cluster tree of a case study from its transmission lines (and demand/availability if present)
+    and writes it into the clusters of its config.toml, together with the dendrogram index
+    """
+    case = CaseStudy(folder)
+    config = case.config
+
+    def read(key):
+        return case.read(key) if case.exists(key) else None
+
+    demand, availability, generation = read('demand'), read('generation_availability'), read('generation')
+    graph = graph_from_lines(case.lines)
+    # locations without any line still have to be in the tree
+    for df in (demand, availability, generation):
+        if df is not None:
+            graph.add_nodes_from(df['location'].astype(str))
+    clusters = create_clusters(graph, demand=demand, availability=availability, group_size=group_size)
+
+    case.data_config['clusters'] = clusters
+    with open(case.config_path, 'w') as f:
+        toml.dump(config, f)
+    write_dendrogram_index(folder, clusters)
+    return clusters
+
+
+def check_depth(sizes=(4, 32, 33, 257), group_sizes=(2, 3, 4)):
+    """
+    regression check of the balance of the trees: on star and path graphs every level has to at least halve the
+    number of clusters, so the tree of n locations has at most ceil(log2(n)) levels and holds every location once
+    """
+    for n in sizes:
+        for name, graph in (('star', nx.star_graph(n - 1)), ('path', nx.path_graph(n))):
+            graph = nx.relabel_nodes(graph, {node: f'l{node}' for node in graph})
+            nx.set_edge_attributes(graph, 1000, 'capacity')
+            for group_size in group_sizes:
+                index = build_dendrogram_index(create_clusters(graph, group_size=group_size))
+                assert sorted(index['locations']) == sorted(graph.nodes), f"{name} {n}: locations lost"
+                levels = get_levels(index)
+                assert levels <= ceil(log2(n)), f"{name} {n}, group_size {group_size}: {levels} levels"
+                print(f'{name} of {n} locations, group_size {group_size}: {levels} levels')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--check']:
+        check_depth()
+    else:
+        print(cluster_case_study('case_studies/stylized_EU_directional'))
@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from csv_writer import DEFAULT_CHUNK_SIZE, chunked
+
+OUTPUT_FORMATS = ('csv', 'columnar')
+
+# file name of every input table in each output format
+# the columnar format stores demand as a dense (location x time_step) array and availability as a dense
+# (location x technology x time_step) array, the long-format tables are stored as feather files
+FILE_NAMES = {
+    'csv': {
+        'demand': 'demand.csv',
+        'generation_availability': 'generation_availability.csv',
+        'generation': 'generation.csv',
+        'transmission_lines': 'transmission_lines2.csv',
+    },
+    'columnar': {
+        'demand': 'demand.npy',
+        'generation_availability': 'generation_availability.npy',
+        'generation': 'generation.feather',
+        'transmission_lines': 'transmission_lines2.feather',
+    },
+}
+
+# labels of every axis of the dense arrays
+INDEX = 'columnar_index.json'
+
+# availability of a (location, technology, time_step) without a row, like get(generation_availability, ..., 1.0)
+# in the model: technologies without a profile are always fully available
+DEFAULT_AVAILABILITY = 1.0
+
+
+def frames_from_rows(rows, header, chunk_size=DEFAULT_CHUNK_SIZE):
+    "turns a (lazy) iterable of row tuples into DataFrames of at most chunk_size rows"
+    for chunk in chunked(rows, chunk_size):
+        yield pd.DataFrame(chunk, columns=header)
+
+
+def write_index(input_folder, locations, technologies, time_steps):
+    with open(os.path.join(input_folder, INDEX), 'w') as f:
+        json.dump({
+            'locations': list(locations),
+            'technologies': list(technologies),
+            'time_steps': [int(t) for t in time_steps],
+        }, f)
+
+
+def write_dense(path, frames, key_columns, value_column, labels, fill=0.0):
+    """
+    fills a memory-mapped .npy array from long-format DataFrames, one frame at a time
+
+    inputs:
+        path:           [string]            .npy file to write
+        frames:         [iterable]          DataFrames with the key_columns and the value_column
+        key_columns:    [list of string]    one column per array axis, e.g. ["location", "time_step"]
+        value_column:   [string]            column with the values
+        labels:         [list of lists]     labels along every axis, in the same order as key_columns
+        fill:           [float]             value of the cells without a row, DEFAULT_AVAILABILITY for availability
+    """
+    positions = [pd.Series(np.arange(len(axis)), index=axis) for axis in labels]
+    array = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=tuple(len(axis) for axis in labels))
+    if fill:
+        array[...] = fill
+    for frame in frames:
+        index = tuple(position.loc[frame[column]].to_numpy() for position, column in zip(positions, key_columns))
+        array[index] = frame[value_column].to_numpy(dtype=np.float64)
+    array.flush()
+    del array
+
+
+def write_table(path, header, rows):
+    "writes a long-format table (generation, transmission lines) as a feather file"
+    pd.DataFrame(list(rows), columns=header).to_feather(path)
+
+
+def load_columnar(input_folder):
+    """
+    loads a case study written with output_format='columnar'
+
+    The dense arrays are memory-mapped, so slicing them (see select) reads only the slice from disk.
+    returns a dict with the keys: index, demand, generation_availability, generation, transmission_lines
+    """
+    files = FILE_NAMES['columnar']
+    with open(os.path.join(input_folder, INDEX)) as f:
+        index = json.load(f)
+    return {
+        'index': index,
+        'demand': np.load(os.path.join(input_folder, files['demand']), mmap_mode='r'),
+        'generation_availability': np.load(os.path.join(input_folder, files['generation_availability']), mmap_mode='r'),
+        'generation': pd.read_feather(os.path.join(input_folder, files['generation'])),
+        'transmission_lines': pd.read_feather(os.path.join(input_folder, files['transmission_lines'])),
+    }
+
+
+def select(data, name, locations=None, first_time_step=None, last_time_step=None):
+    """
+    slices a dense array of load_columnar by location labels and an (inclusive) time step window
+
+    A time window on all locations is a zero-copy view, selecting locations copies only the selected rows.
+    """
+    index = data['index']
+    time_steps = index['time_steps']
+    start = 0 if first_time_step is None else time_steps.index(first_time_step)
+    stop = len(time_steps) if last_time_step is None else time_steps.index(last_time_step) + 1
+
+    array = data[name][..., start:stop]
+    if locations is not None:
+        position = {location: i for i, location in enumerate(index['locations'])}
+        array = array[[position[location] for location in locations]]
+    return array
@@ -0,0 +1,84 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sp
+from scipy.signal import lfilter
+
+# Spatially and temporally correlated availability. The standard normal noise of technologies.add_gen_av is
+# replaced by a gaussian field z = F @ y, where F (locations x rank) is a factor of the spatial correlation matrix
+# and every row of y (rank x time_steps) is an AR(1) process with unit variance. So every location still has standard
+# normal noise, but neighbouring locations and consecutive hours move together. F is computed once per topology,
+# after that drawing the whole (location x time) field is a single filter and a single matrix product.
+#
+# The spatial correlation is a diffusion kernel expm(-beta L) on the graph Laplacian L of the transmission lines,
+# or a squared exponential kernel on coordinates (e.g. of the grid). Both are positive semi-definite, so the factor
+# comes from their eigendecomposition, truncated to the eigenvalues that matter.
+
+
+def graph_laplacian(edges, locations):
+    "unweighted Laplacian of the undirected graph with the (from, to) edges, rows in the order of locations"
+    position = {location: i for i, location in enumerate(locations)}
+    pairs = np.array([(position[a], position[b]) for a, b in edges if a != b], dtype=np.int64).reshape(-1, 2)
+    n = len(locations)
+    adjacency = sp.coo_array((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n)).tocsr()
+    adjacency = ((adjacency + adjacency.T) > 0).astype(float)
+    return (sp.diags_array(np.asarray(adjacency.sum(axis=1)).ravel()) - adjacency).toarray()
+
+
+def graph_factor(edges, locations, length_scale=2.0, rank=None, tolerance=1e-3):
+    """
+    factor of the diffusion kernel expm(-length_scale^2 / 2 * L) on the transmission graph
+
+    length_scale is in hops: on a chain or a grid the correlation falls off like a gaussian with that width.
+    Only the eigenvectors whose kernel eigenvalue is above tolerance times the largest are kept (at most rank).
+    """
+    beta = length_scale ** 2 / 2
+    laplacian = graph_laplacian(edges, locations)
+    # the kernel eigenvalues exp(-beta lambda) are above tolerance for lambda below -log(tolerance) / beta
+    values, vectors = scipy.linalg.eigh(laplacian, subset_by_value=(-np.inf, -np.log(tolerance) / beta))
+    return _normalize(vectors, np.exp(-beta * values), rank)
+
+
+def grid_coordinates(gridsize):
+    "(row, column) of l1..l{gridsize} in the square grid of generate_case_study_grid, numbered row by row"
+    side = int(round(np.sqrt(gridsize)))
+    index = np.arange(gridsize)
+    return np.column_stack([index // side, index % side]).astype(float)
+
+
+def coordinate_factor(coordinates, length_scale=2.0, rank=None, tolerance=1e-3):
+    "factor of the squared exponential kernel exp(-|x - y|^2 / (2 length_scale^2)) on the coordinates"
+    coordinates = np.asarray(coordinates, dtype=float)
+    squares = np.sum(coordinates ** 2, axis=1)
+    distances = np.maximum(squares[:, None] + squares[None, :] - 2 * coordinates @ coordinates.T, 0)
+    values, vectors = scipy.linalg.eigh(np.exp(-distances / (2 * length_scale ** 2)))
+    keep = values > tolerance * values[-1]
+    return _normalize(vectors[:, keep], values[keep], rank)
+
+
+def _normalize(vectors, values, rank):
+    "F = V sqrt(values) with the largest rank values, rows rescaled so every location has unit variance"
+    order = np.argsort(values)[::-1][:rank]
+    factor = vectors[:, order] * np.sqrt(values[order])
+    return factor / np.linalg.norm(factor, axis=1, keepdims=True)
+
+
+def ar1(noise, autocorrelation):
+    """
+    turns white standard normal noise (rows x time_steps) into stationary AR(1) processes with unit variance
+
+    x_0 = e_0, x_t = a x_{t-1} + sqrt(1 - a^2) e_t
+    """
+    scale = np.sqrt(1 - autocorrelation ** 2)
+    if scale == 0:
+        return np.repeat(noise[:, :1], noise.shape[1], axis=1)
+    noise = noise.copy()
+    noise[:, 0] /= scale
+    return lfilter([scale], [1, -autocorrelation], noise, axis=1)
+
+
+def sample_field(factor, time_steps, autocorrelation=0.9, rng=np.random):
+    """
+    draws the (location x time_step) standard normal field with spatial correlation factor @ factor.T
+    and lag one autocorrelation autocorrelation
+    """
+    return factor @ ar1(rng.standard_normal((factor.shape[1], time_steps)), autocorrelation)
@@ -0,0 +1,68 @@
+import gzip
+import os
+import warnings
+from itertools import islice
+
+# number of rows that are formatted and written at once, this bounds the peak memory of a writer
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def output_path(path, compress=False):
+    "the file a writer creates for path, with '.gz' appended when compress is set"
+    return f'{path}.gz' if compress else path
+
+
+def open_output(path, compress=False):
+    """
+    opens path for writing text, gzip-compressed if compress is set (".gz" is appended to the path)
+    """
+    if compress:
+        return gzip.open(output_path(path, compress), 'wt', newline='')
+    return open(path, 'w+', newline='')
+
+
+def warn_compressed(folder):
+    """
+    the config.toml of a generated case study names the plain CSV files, which is what main.jl reads,
+    so compressed inputs have to be unpacked before solving
+    """
+    inputs = os.path.join(os.path.normpath(folder), 'inputs', '*.csv.gz')
+    warnings.warn(f'the inputs of {folder} are gzip-compressed, main.jl reads plain CSV: run gunzip {inputs} before solving',
+                  stacklevel=3)
+
+
+def chunked(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    "yields lists of at most chunk_size rows from any (lazy) iterable of rows"
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_rows(path, header, rows, chunk_size=DEFAULT_CHUNK_SIZE, compress=False):
+    """
+    streams rows to a csv file in bounded chunks, so only one chunk is ever held in memory
+
+    inputs:
+        path:       [string]            file to write
+        header:     [list of string]    column names
+        rows:       [iterable]          tuples with one value per column, preferably a generator
+        chunk_size: [int]               number of rows formatted and written at once
+        compress:   [bool]              gzip the output
+    """
+    with open_output(path, compress) as f:
+        f.write(','.join(header) + '\n')
+        for chunk in chunked(rows, chunk_size):
+            f.write(''.join(','.join(map(str, row)) + '\n' for row in chunk))
+
+
+def write_frames(path, header, frames, compress=False):
+    """
+    streams an iterable of DataFrames (all with the columns in header) to a single csv file
+    """
+    with open_output(path, compress) as f:
+        f.write(','.join(header) + '\n')
+        for frame in frames:
+            frame.to_csv(f, header=False, index=False, columns=header)
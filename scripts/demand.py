@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from csv_writer import DEFAULT_CHUNK_SIZE
+
+# Batched demand generation for the generators. The demand of all locations is one (location x time_step) matrix:
+# the random changes are drawn in one call, in the same (location, time_step) order as the per row loops they
+# replace so seeded case studies do not change, and the clamped random walk loops over time with vector operations
+# over all locations. An optional shared component moves all locations together and an optional daily and weekly
+# profile adds seasonality.
+
+
+def clamped_random_walk(initial, changes, low, high):
+    """
+    walk[:, 0] = initial, walk[:, t + 1] = clip(walk[:, t] + changes[:, t], low, high)
+
+    The clamping depends on the path, so this can not be a cumulative sum, but every step is one vector operation.
+    """
+    walk = np.empty_like(changes)
+    walk[:, 0] = initial
+    for t in range(changes.shape[1] - 1):
+        np.clip(walk[:, t] + changes[:, t], low, high, out=walk[:, t + 1])
+    return walk
+
+
+def seasonality(time_steps, daily_amplitude=0.0, weekly_amplitude=0.0, first_time_step=1):
+    "additive profile with a daily peak at 18:00 and lower demand in the weekend, hour 0 of time step 1 is a monday"
+    hours = np.arange(first_time_step, first_time_step + time_steps)
+    daily = daily_amplitude * np.cos(2 * np.pi * (hours % 24 - 18) / 24)
+    weekly = weekly_amplitude * np.where(hours % 168 >= 120, -1.0, 2 / 5)
+    return daily + weekly
+
+
+def generate_demand(n, time_steps, rng=np.random, low=3000, high=8000, step=500, random_walk=True, shared=0.0,
+                    daily_amplitude=0.0, weekly_amplitude=0.0):
+    """
+    demand matrix (n x time_steps) of n locations
+
+    inputs:
+        rng:            np.random.Generator or the np.random module (the legacy global state)
+        low, high:      [float]     range of the initial demand and bounds of the random walk
+        step:           [float]     changes are drawn uniformly from [-step, step]
+        random_walk:    [bool]      a clamped random walk from the initial demand, otherwise every time step is
+                                    the initial demand plus an independent change
+        shared:         [float]     weight (0..1) of a system wide change that all locations share
+        daily_amplitude, weekly_amplitude: [float]  amplitude of the seasonality added on top, see seasonality
+    """
+    initial = rng.uniform(low, high, size=n)
+    changes = rng.uniform(-step, step, size=(n, time_steps))
+    if shared:
+        changes = (1 - shared) * changes + shared * rng.uniform(-step, step, size=time_steps)
+
+    if random_walk:
+        demand = clamped_random_walk(initial, changes, low, high)
+    else:
+        demand = initial[:, None] + changes
+
+    if daily_amplitude or weekly_amplitude:
+        demand = np.maximum(demand + seasonality(time_steps, daily_amplitude, weekly_amplitude), 0)
+    return demand
+
+
+def demand_frames(locations, time_steps, demand, chunk_size=DEFAULT_CHUNK_SIZE):
+    "yields the demand matrix as long (location, time_step, demand) frames of about chunk_size rows"
+    time_steps = np.asarray(time_steps)
+    block = max(1, chunk_size // len(time_steps))
+    for start in range(0, len(locations), block):
+        rows = demand[start:start + block]
+        yield pd.DataFrame({
+            'location': np.repeat(locations[start:start + block], len(time_steps)),
+            'time_step': np.tile(time_steps, len(rows)),
+            'demand': rows.ravel(),
+        })
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+# Flat index of a nested cluster tree (the clusters list of config.toml), stored next to config.toml.
+# Level i (1-based) holds the clusters of the i-th reduction of run_optimisation: level 1 are the innermost
+# lists of the tree, every next level merges the clusters of the level before into their parents.
+#
+#   locations   [n]             all locations in tree order
+#   labels      [levels x n]    cluster index of every location at every level
+#   sizes       [sum clusters]  number of locations per cluster, level after level (see offsets)
+#   parents     [sum clusters]  index of the cluster at the next level that contains this cluster, -1 at the last level
+#   offsets     [levels + 1]    start of every level in sizes and parents
+INDEX = 'dendrogram.npz'
+
+
+def build_dendrogram_index(tree):
+    """
+    builds the flat index of a cluster tree in a single iterative walk (no recursion, so any depth works)
+    """
+    locations = []
+    ancestors = []
+
+    # depth first walk, every node gets an id and every location remembers the ids of all its ancestors
+    node_count = 0
+    stack = [(tree, ())]
+    while stack:
+        node, path = stack.pop()
+        if not isinstance(node, list):
+            locations.append(node)
+            ancestors.append(path)
+            continue
+        path = path + (node_count,)
+        node_count += 1
+        stack.extend((child, path) for child in reversed(node))
+
+    depths = {len(path) for path in ancestors}
+    assert len(depths) == 1, "all locations of the cluster tree have to be at the same depth"
+    depth = depths.pop()
+
+    # the cluster of a location at level i is its ancestor i steps above it, the root is never a cluster
+    levels = max(0, depth - 1)
+    node_ids = np.array(ancestors, dtype=np.int64).reshape(len(locations), depth)
+    labels = np.empty((levels, len(locations)), dtype=np.int64)
+    sizes, parents, offsets = [], [], [0]
+    for level in range(levels):
+        # number the clusters in order of first appearance, so they follow the tree order like reduction.jl
+        ids, first, labels[level] = np.unique(node_ids[:, depth - 1 - level], return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        labels[level] = rank[labels[level]]
+        sizes.append(np.bincount(labels[level], minlength=len(ids)))
+        offsets.append(offsets[-1] + len(ids))
+
+    for level in range(levels):
+        parent = np.full(offsets[level + 1] - offsets[level], -1, dtype=np.int64)
+        if level + 1 < levels:
+            parent[labels[level]] = labels[level + 1]
+        parents.append(parent)
+
+    return {
+        'locations': np.array(locations, dtype=str),
+        'labels': labels,
+        'sizes': np.concatenate(sizes) if sizes else np.zeros(0, dtype=np.int64),
+        'parents': np.concatenate(parents) if parents else np.zeros(0, dtype=np.int64),
+        'offsets': np.array(offsets, dtype=np.int64),
+    }
+
+
+def write_dendrogram_index(folder, tree):
+    "builds the index of tree and stores it next to the config.toml in folder"
+    np.savez(os.path.join(folder, INDEX), **build_dendrogram_index(tree))
+
+
+def load_dendrogram_index(folder):
+    with np.load(os.path.join(folder, INDEX)) as index:
+        return {key: index[key] for key in index.files}
+
+
+def get_levels(index):
+    return index['labels'].shape[0]
+
+
+def get_level_sizes(index, level):
+    return index['sizes'][index['offsets'][level - 1]:index['offsets'][level]]
+
+
+def get_level_parents(index, level):
+    return index['parents'][index['offsets'][level - 1]:index['offsets'][level]]
+
+
+def get_level_clusters(index, level):
+    "the clusters (lists of locations, in tree order) of a level, without walking the tree"
+    labels = index['labels'][level - 1]
+    order = np.argsort(labels, kind='stable')
+    bounds = np.cumsum(get_level_sizes(index, level))[:-1]
+    return [cluster.tolist() for cluster in np.split(index['locations'][order], bounds)]
+
+
+def get_reduced_tree(index, level, names):
+    """
+    the cluster tree of the case study reduced to a level, with the clusters of that level replaced by names
+    """
+    nodes = list(names)
+    for parent_level in range(level + 1, get_levels(index) + 1):
+        parents = [[] for _ in range(len(get_level_sizes(index, parent_level)))]
+        for node, parent in zip(nodes, get_level_parents(index, parent_level - 1)):
+            parents[parent].append(node)
+        nodes = parents
+    return nodes
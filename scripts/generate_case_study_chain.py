@@ -1,6 +1,11 @@
 import random
 import os
 
+from case_study_cache import fingerprint, fingerprint_files, stale_artifacts, update_manifest
+from csv_writer import output_path, warn_compressed, write_rows
+from dendrogram_index import INDEX, write_dendrogram_index
+from profiling import stage
+
 def get_clusters(locations):
     if len(locations) == 0:
         return []
@@ -23,10 +28,41 @@ def create_chain_clusters(chain_length):
     return get_clusters(locations)    
     
     
-def create_chain_case_study(name, n, time_steps):
+def get_artifact_keys(n, time_steps, seed=None, compress=False):
+    "fingerprint of every input each artifact of a chain case study is generated from"
+    source = fingerprint_files(__file__)
+    # without a seed the line capacities differ on every run, so the lines are always regenerated
+    lines_seed = seed if seed is not None else os.urandom(16).hex()
+    return {
+        f'inputs/{output_path("demand.csv", compress)}': fingerprint(source, n, time_steps),
+        f'inputs/{output_path("generation_availability.csv", compress)}': fingerprint(source),
+        f'inputs/{output_path("generation.csv", compress)}': fingerprint(source, n),
+        f'inputs/{output_path("transmission_lines2.csv", compress)}': fingerprint(source, n, lines_seed),
+        'inputs/scalars.toml': fingerprint(source),
+        'config.toml': fingerprint(source, n),
+        INDEX: fingerprint(source, n),
+    }
+
+
+def create_chain_case_study(name, n, time_steps, seed=None, compress=False):
+    """
+    seed seeds the random line capacities, by default they differ on every run
+    compress gzips the CSV inputs, they have to be unpacked before main.jl can read them
+    """
+    rng = random.Random(seed)
     folder = f'case_studies/{name}'
     input_folder = f'{folder}/inputs'
 
+    # Only regenerate the artifacts whose inputs changed since the last run
+    keys = get_artifact_keys(n, time_steps, seed, compress)
+    stale = stale_artifacts(folder, keys)
+    if not stale:
+        print(f'{folder} is up to date')
+        return
+
+    def artifact(file):
+        return f'inputs/{output_path(file, compress)}'
+
     # Create folders
     if not os.path.exists(folder):
         os.makedirs(folder)
@@ -35,50 +71,51 @@ def create_chain_case_study(name, n, time_steps):
 
 
     # Demands
-    demands = ["location,time_step,demand"]
-    for location in range(n):
-        for time_step in range(time_steps):
-            demands.append(f"l{location},{time_step},100")
-
-    with open(f'{input_folder}/demand.csv', 'w+') as f:
-        f.write('\n'.join(demands) + '\n')
+    if artifact('demand.csv') in stale:
+        with stage('demand', folder, f'{folder}/{artifact("demand.csv")}'):
+            demands = (
+                (f"l{location}", time_step, 100)
+                for location in range(n)
+                for time_step in range(time_steps)
+            )
+            write_rows(f'{input_folder}/demand.csv', ["location", "time_step", "demand"], demands, compress=compress)
 
 
     # Generation availability
-    generation_av = ["location,technology,time_step,availability"]
     # TODO add generation availability
-    with open(f'{input_folder}/generation_availability.csv', 'w+') as f:
-        f.write('\n'.join(generation_av) + '\n')
+    if artifact('generation_availability.csv') in stale:
+        with stage('availability', folder, f'{folder}/{artifact("generation_availability.csv")}'):
+            write_rows(f'{input_folder}/generation_availability.csv', ["location", "technology", "time_step", "availability"],
+                       [], compress=compress)
 
 
     # Generation
-    generation = ["technology,location,investment_cost,variable_cost,unit_capacity,ramping_rate"]
-
-    for location in range(n):
-        generation.append(f"Gas,l{location},23.33333333,0.05,250,0.75")
-
-    with open(f'{input_folder}/generation.csv', 'w+') as f:
-        f.write('\n'.join(generation) + '\n')
+    if artifact('generation.csv') in stale:
+        with stage('generation', folder, f'{folder}/{artifact("generation.csv")}'):
+            generation = (("Gas", f"l{location}", 23.33333333, 0.05, 250, 0.75) for location in range(n))
+            write_rows(f'{input_folder}/generation.csv',
+                       ["technology", "location", "investment_cost", "variable_cost", "unit_capacity", "ramping_rate"],
+                       generation, compress=compress)
 
     # transmission_lines
-    transmission_lines = ["from,to,capacity"]
-    for i in range(n-1):
-        transmission_lines.append(
-            f"l{i},l{i+1},{random.randint(1, 20) * 10}"
-        )
-
-    with open(f'{input_folder}/transmission_lines2.csv', 'w+') as f:
-        f.write("\n".join(transmission_lines))
-
-    with open(f'{input_folder}/scalars.toml', 'w+') as f:
-        f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
+    if artifact('transmission_lines2.csv') in stale:
+        with stage('transmission', folder, f'{folder}/{artifact("transmission_lines2.csv")}'):
+            transmission_lines = ((f"l{i}", f"l{i+1}", rng.randint(1, 20) * 10) for i in range(n-1))
+            write_rows(f'{input_folder}/transmission_lines2.csv', ["from", "to", "capacity"], transmission_lines,
+                       compress=compress)
+
+    with stage('config', folder, f'{input_folder}/scalars.toml', f'{folder}/config.toml'):
+        if 'inputs/scalars.toml' in stale:
+            with open(f'{input_folder}/scalars.toml', 'w+') as f:
+                f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
 value_of_lost_load = 3.0
 # If true, an LP relaxation of the problem will be solved
 relaxation = false
     """)
 
-    with open(f'{folder}/config.toml', 'w+') as f:
-        f.write(f"""[input.data]
+        if 'config.toml' in stale:
+            with open(f'{folder}/config.toml', 'w+') as f:
+                f.write(f"""[input.data]
 # input directory with the files
 dir = "inputs"
 demand = "demand.csv"
@@ -101,7 +138,15 @@ line_flow = "line_flow.csv"
 loss_of_load = "loss_of_load.csv"
 scalars = "scalars.toml"
                 """)
+
+        if INDEX in stale:
+            write_dendrogram_index(folder, create_chain_clusters(n))
+
+    update_manifest(folder, keys)
+    if compress:
+        warn_compressed(folder)
     
     
-n = 5
-create_chain_case_study(f"{n}_chain", n, 100)
+if __name__ == '__main__':
+    n = 5
+    create_chain_case_study(f"{n}_chain", n, 100)
@@ -4,62 +4,147 @@ import os
 import numpy as np
 import pandas as pd
 
+import correlated_availability
+import demand as demand_module
+import technologies
+import topology
+from case_study_cache import fingerprint, fingerprint_files, stale_artifacts, update_manifest
+from columnar import FILE_NAMES, write_dense, write_index
+from correlated_availability import graph_factor
+from csv_writer import output_path, warn_compressed, write_frames
+from demand import demand_frames, generate_demand
+from dendrogram_index import INDEX, write_dendrogram_index
+from profiles import profile_fingerprint
+from profiling import stage
 from technologies import add_generation_and_generation_availability
+from topology import clique_edges, location_names
 
 def create_clusters(n, clique_size):
     input_list = list(f'l{i}' for i in range(n))
     return [input_list[i:i + clique_size] for i in range(0, n, clique_size)]
 
-def create_clique_case_study(name, n, clique_size, time_steps, bound_alpha_factor):
+def get_artifact_keys(n, clique_size, time_steps, bound_alpha_factor, seed, output_format='csv', technology_mix=None,
+                      correlation_length=None, compress=False):
+    "fingerprint of every input each artifact of a clique case study is generated from"
+    files = {key: output_path(file, compress) for key, file in FILE_NAMES[output_format].items()}
+    source = fingerprint_files(__file__, technologies.__file__)
+    lines = fingerprint(fingerprint_files(topology.__file__), n, clique_size)
+    # the correlated availability is drawn on the transmission graph, so it also depends on the lines
+    correlation = None
+    if correlation_length is not None:
+        correlation = (correlation_length, lines, fingerprint_files(correlated_availability.__file__))
+    generation = fingerprint(source, n, time_steps, seed, technologies.AVAILABILITY_TECHNOLOGIES,
+                             technologies.GENERATION_TECHNOLOGIES, technology_mix, correlation, profile_fingerprint())
+    return {
+        f'inputs/{files["demand"]}': fingerprint(source, fingerprint_files(demand_module.__file__), n, time_steps, seed),
+        f'inputs/{files["generation_availability"]}': generation,
+        f'inputs/{files["generation"]}': generation,
+        f'inputs/{files["transmission_lines"]}': fingerprint(source, lines),
+        'inputs/scalars.toml': fingerprint(source),
+        'config.toml': fingerprint(source, n, clique_size, time_steps, bound_alpha_factor),
+        INDEX: fingerprint(source, n, clique_size),
+    }
+
+def create_clique_case_study(name, n, clique_size, time_steps, bound_alpha_factor, seed=42, output_format='csv',
+                             technology_mix=None, correlation_length=None, compress=False):
+    """
+    output_format is 'csv' (default, read by main.jl) or 'columnar' (dense arrays and feather tables, see columnar.py)
+    technology_mix is the list of technologies to generate, by default all of technologies.TECHNOLOGIES
+    correlation_length (in hops on the transmission graph) makes the availability spatially correlated,
+    by default it is drawn independently per location
+    compress gzips the CSV inputs, they have to be unpacked before main.jl can read them
+    """
     folder = f'case_studies/{name}'
     input_folder = f'{folder}/inputs'
-    
-    np.random.seed(42)
+    files = FILE_NAMES[output_format]
+
+    assert n % clique_size == 0
+    assert not compress or output_format == 'csv', "only the csv inputs can be compressed"
+
+    # Only regenerate the artifacts whose inputs changed since the last run
+    keys = get_artifact_keys(n, clique_size, time_steps, bound_alpha_factor, seed, output_format, technology_mix,
+                             correlation_length, compress)
+    stale = stale_artifacts(folder, keys)
+    if not stale:
+        print(f'{folder} is up to date')
+        return
 
     # Create folders
     if not os.path.exists(folder):
         os.makedirs(folder)
     if not os.path.exists(input_folder):
         os.makedirs(input_folder)
-    
-
-    assert n % clique_size == 0
-    initial_demand = np.random.uniform(3000, 8000, size=n)
-    # Demands
-    demands = ["location,time_step,demand"]
-    for location in range(n):
-        for time_step in range(1, time_steps + 1):
-            change = np.random.uniform(-500, 500)
-            demands.append(f"l{location},{time_step},{initial_demand[location] + change}")
-
-    with open(f'{input_folder}/demand.csv', 'w+') as f:
-        f.write('\n'.join(demands) + '\n')
-
-
-    add_generation_and_generation_availability(n, name, time_steps)
-
-    # transmission_lines
-    transmission_lines = ["from,to,capacity"]
-    for clique in range(n // clique_size):
-        clique_iterator = range(clique * clique_size, (clique + 1) * clique_size)
-        transmission_lines.extend(
-            f"l{i},l{j},4000"
-            for i in clique_iterator
-            for j in clique_iterator
-            if i != j
-        )
-
-    clique_connector_iterator = range(0, n, clique_size)
-    transmission_lines.extend(
-            f"l{i},l{j},2000"
-            for i in clique_connector_iterator
-            for j in clique_connector_iterator
-            if i != j
-        )
-
-    with open(f'{input_folder}/transmission_lines2.csv', 'w+') as f:
-        f.write('\n'.join(transmission_lines) + '\n')
-
+    if output_format == 'columnar':
+        write_index(input_folder, [f'l{i}' for i in range(n)],
+                    [t for t in technologies.TECHNOLOGIES if technology_mix is None or t in technology_mix],
+                    range(1, time_steps + 1))
+
+    def artifact(key):
+        return f'inputs/{output_path(files[key], compress)}'
+
+    if artifact('demand') in stale:
+        with stage('demand', folder, f'{folder}/{artifact("demand")}'):
+            np.random.seed(seed)
+            # Demands, the initial demand of every location plus an independent change per time step
+            locations = [f'l{i}' for i in range(n)]
+            demands = demand_frames(locations, range(1, time_steps + 1),
+                                    generate_demand(n, time_steps, np.random, random_walk=False))
+            header = ["location", "time_step", "demand"]
+            if output_format == 'csv':
+                write_frames(f'{input_folder}/{files["demand"]}', header, demands, compress)
+            else:
+                write_dense(f'{input_folder}/{files["demand"]}', demands, ["location", "time_step"], "demand",
+                            [locations, list(range(1, time_steps + 1))])
+
+    if stale & {artifact('generation_availability'), artifact('generation')}:
+        # seeded separately so that the generation does not depend on whether the demand was regenerated
+        np.random.seed(seed + 1)
+        factor = None
+        if correlation_length is not None:
+            lines = get_transmission_lines(n, clique_size)
+            factor = graph_factor(zip(lines['from'], lines['to']), [f'l{i}' for i in range(n)], correlation_length)
+        add_generation_and_generation_availability(n, name, time_steps, output_format, technology_mix, factor,
+                                                   compress=compress)
+
+    if artifact('transmission_lines') in stale:
+        with stage('transmission', folder, f'{folder}/{artifact("transmission_lines")}'):
+            write_transmission_lines(input_folder, n, clique_size, output_format, compress)
+
+    with stage('config', folder, f'{input_folder}/scalars.toml', f'{folder}/config.toml', f'{folder}/{INDEX}'):
+        if 'inputs/scalars.toml' in stale:
+            write_scalars(input_folder)
+
+        if 'config.toml' in stale:
+            write_config(folder, n, clique_size, time_steps, bound_alpha_factor)
+
+        if INDEX in stale:
+            write_dendrogram_index(folder, create_clusters(n, clique_size))
+
+    update_manifest(folder, keys)
+    if compress:
+        warn_compressed(folder)
+
+
+def get_transmission_lines(n, clique_size):
+    "(from, to, capacity) frame of every line, all lines within a clique and between the first locations of the cliques"
+    (clique_sources, clique_targets), (connector_sources, connector_targets) = clique_edges(n, clique_size)
+    names = location_names(n)
+    return pd.DataFrame({
+        'from': names[np.concatenate([clique_sources, connector_sources])],
+        'to': names[np.concatenate([clique_targets, connector_targets])],
+        'capacity': np.concatenate([np.full(len(clique_sources), 4000), np.full(len(connector_sources), 2000)]),
+    })
+
+
+def write_transmission_lines(input_folder, n, clique_size, output_format='csv', compress=False):
+    path = f'{input_folder}/{FILE_NAMES[output_format]["transmission_lines"]}'
+    if output_format == 'csv':
+        write_frames(path, ['from', 'to', 'capacity'], [get_transmission_lines(n, clique_size)], compress)
+    else:
+        get_transmission_lines(n, clique_size).to_feather(path)
+
+
+def write_scalars(input_folder):
     with open(f'{input_folder}/scalars.toml', 'w+') as f:
         f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
 value_of_lost_load = 3.0
@@ -67,7 +152,9 @@ value_of_lost_load = 3.0
 # If true, an LP relaxation of the problem will be solved
 relaxation = false
     """)
-        
+
+
+def write_config(folder, n, clique_size, time_steps, bound_alpha_factor):
     with open(f'{folder}/config.toml', 'w+') as f:
         f.write(f"""[input.data]
 # input directory with the files
@@ -97,10 +184,11 @@ scalars = "scalars.toml"
                 """)
 
 
-n = 16
-cs = 4
-t = 48
-alpha = 0.9
-name = f'cliques/{n}_{cs}_{t}_{alpha}'
-create_clique_case_study(name=name,n=n,clique_size=cs,time_steps=t, bound_alpha_factor=alpha)
-print(f'    "case_studies/{name}/config.toml",')
+if __name__ == '__main__':
+    n = 16
+    cs = 4
+    t = 48
+    alpha = 0.9
+    name = f'cliques/{n}_{cs}_{t}_{alpha}'
+    create_clique_case_study(name=name,n=n,clique_size=cs,time_steps=t, bound_alpha_factor=alpha)
+    print(f'    "case_studies/{name}/config.toml",')
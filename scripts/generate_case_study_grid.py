@@ -2,6 +2,23 @@ import pandas as pd
 import numpy as np
 import toml
 import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from time import perf_counter
+
+from case_study_cache import fingerprint, fingerprint_files, stale_artifacts, update_manifest
+from columnar import DEFAULT_AVAILABILITY, FILE_NAMES, write_dense, write_index, write_table
+from csv_writer import output_path, warn_compressed, write_frames, write_rows
+import demand as demand_module
+from demand import demand_frames, generate_demand
+from dendrogram_index import INDEX, write_dendrogram_index
+import parse_transmission_lines_directional
+import profiling
+import topology
+from parse_transmission_lines_directional import to_directional
+from profiling import stage
+from topology import bidirectional_lines, grid_edges, location_names
 
 #assume gridsize = a squared number of 2^x for integers x
 def create_clusters(locations, grid_size):
@@ -34,18 +51,6 @@ def create_clusters(locations, grid_size):
         
     return clusters
 
-# grid_size is expected to be a squared number of 2^x for integers x
-# loc_index is the index of the location for which you want to neighbors
-def get_neighbors(loc_index, grid_size):
-    neighbors = []
-    n = int(np.sqrt(grid_size))
-    if (loc_index % n != 0):
-        neighbors.append(loc_index + 1)
-    if (loc_index + n <= grid_size):
-        neighbors.append(loc_index + n)
-    
-    return neighbors
-
 def create_tomls(path, inputpath):
     with open(inputpath + 'scalars.toml', 'w+') as f:
         f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
@@ -80,107 +85,198 @@ def create_tomls(path, inputpath):
                                 """)
 
 #generates all the instances of possible parameters
-def generate(time, yeartime, gridsize, seed):
-    folder = f'./case_studies/grid_{seed}/'
+#rng is the np.random.Generator used for all random draws, by default it is seeded with seed
+#output_format is 'csv' (read by main.jl) or 'columnar' (dense arrays and feather tables, see columnar.py)
+#compress gzips the csv inputs, they have to be unpacked before main.jl can read them
+def generate(time, yeartime, gridsize, seed, rng=None, name=None, output_format='csv', compress=False):
+    assert not compress or output_format == 'csv', "only the csv inputs can be compressed"
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if name is None:
+        name = f'grid_{seed}'
+    folder = f'./case_studies/{name}/'
+    path = folder + f'{time}_steps/'
+    inputpath = path + 'inputs/'
+    files = FILE_NAMES[output_format]
+    # the file names of the artifacts, with .gz when they are compressed
+    artifacts = {key: f'inputs/{output_path(file, compress)}' for key, file in files.items()}
+    artifacts['bidirectional'] = f'inputs/{output_path("transmission_lines.csv", compress)}'
+
+    # Only regenerate the artifacts whose inputs changed since the last run
+    source = fingerprint_files(__file__)
+    transmission_key = fingerprint(source, fingerprint_files(topology.__file__, parse_transmission_lines_directional.__file__),
+                                   gridsize)
+    tomls_key = fingerprint(source, time, gridsize)
+    keys = {
+        artifacts['demand']: fingerprint(source, fingerprint_files(demand_module.__file__), time, gridsize,
+                                         rng.bit_generator.state),
+        artifacts['generation_availability']: fingerprint(source, time, gridsize),
+        artifacts['generation']: fingerprint(source, time, yeartime, gridsize),
+        artifacts['bidirectional']: transmission_key,
+        artifacts['transmission_lines']: transmission_key,
+        'inputs/scalars.toml': tomls_key,
+        'config.toml': tomls_key,
+        INDEX: fingerprint(source, gridsize),
+    }
+    stale = stale_artifacts(path, keys)
+    if not stale:
+        print(f'{path} is up to date')
+        return path
+
     if not os.path.exists(folder):
         os.makedirs(folder)
-    path = folder + f'{time}_steps/'
     if not os.path.exists(path):
         os.makedirs(path)
-    inputpath = path + 'inputs/'
     if not os.path.exists(inputpath):
         os.makedirs(inputpath)
     # New parameters
 
     locations = [f'l{i}' for i in range(1, gridsize + 1)]
     time_steps = list(range(1, time + 1))
+    technologies = ['Gas']
+    if output_format == 'columnar':
+        write_index(inputpath, locations, technologies, time_steps)
 
-    create_clusters(locations, gridsize)
-
-    # Generate new demand data
-    demand_data = []
-    initial_demand = np.random.uniform(3000, 8000, size=len(locations))
-
-    for i, location in enumerate(locations):
-        demand = initial_demand[i]
-        for time_step in time_steps:
-            demand_data.append([location, time_step, demand])
-            change = np.random.uniform(-500, 500)
-            demand = max(3000, min(8000, demand + change))
-
-    # add the demand file to the grid case study
-    demand_df = pd.DataFrame(demand_data, columns=['location', 'time_step', 'demand'])
-    demand_df.to_csv(inputpath + 'demand.csv', index=False)
+    if artifacts['demand'] in stale:
+        with stage('demand', path, path + artifacts['demand']):
+            # Generate new demand data, a clamped random walk per location
+            demand = generate_demand(len(locations), time, rng)
 
-    technologies = ['Gas']
+            # add the demand file to the grid case study
+            frames = demand_frames(locations, time_steps, demand)
+            if output_format == 'csv':
+                write_frames(inputpath + files['demand'], ['location', 'time_step', 'demand'], frames, compress)
+            else:
+                write_dense(inputpath + files['demand'], frames, ['location', 'time_step'], 'demand', [locations, time_steps])
 
-    #Add generation availability, which is nothing as of now.
-    generation_availability_data = []
-    generation_availability_df = pd.DataFrame(generation_availability_data, columns=['location', 'technology', 'time_step', 'availability'])
-    generation_availability_df.to_csv(inputpath + 'generation_availability.csv', index=False)
+    if artifacts['generation_availability'] in stale:
+        with stage('availability', path, path + artifacts['generation_availability']):
+            #Add generation availability, which is nothing as of now.
+            header = ['location', 'technology', 'time_step', 'availability']
+            if output_format == 'csv':
+                write_rows(inputpath + files['generation_availability'], header, [], compress=compress)
+            else:
+                write_dense(inputpath + files['generation_availability'], [pd.DataFrame([], columns=header)],
+                            ['location', 'technology', 'time_step'], 'availability', [locations, technologies, time_steps],
+                            fill=DEFAULT_AVAILABILITY)
 
-    #Add generation data
-    generation_data = []
-    for technology in technologies:
-        for location in locations:
+    if artifacts['generation'] in stale:
+        with stage('generation', path, path + artifacts['generation']):
+            #Add generation data, the same generator at every location
             investment_cost = 23.33333 * (time/yeartime)
             variable_cost = 0.05
             unit_capacity = 250
             ramping_rate = 0.75
-            generation_data.append([technology, location, investment_cost, variable_cost, unit_capacity, ramping_rate])
+            generation = (
+                (technology, location, investment_cost, variable_cost, unit_capacity, ramping_rate)
+                for technology in technologies
+                for location in locations
+            )
+            header = ['technology', 'location', 'investment_cost', 'variable_cost', 'unit_capacity', 'ramping_rate']
+            if output_format == 'csv':
+                write_rows(inputpath + files['generation'], header, generation, compress=compress)
+            else:
+                write_table(inputpath + files['generation'], header, generation)
+
+    if stale & {'inputs/scalars.toml', 'config.toml'}:
+        with stage('config', path, inputpath + 'scalars.toml', path + 'config.toml'):
+            create_tomls(path, inputpath)
+
+            # Load the existing configuration
+            config_path = path + 'config.toml'
+            with open(config_path, 'r') as file:
+                config = toml.load(file)
             
-    # Create DataFrame for generation characteristics
-    generation_df = pd.DataFrame(generation_data, columns=['technology', 'location', 'investment_cost', 'variable_cost', 'unit_capacity', 'ramping_rate'])
-    generation_df.to_csv(inputpath + 'generation.csv', index=False)
+            # Update the time_steps
+            config['input']['sets']['time_steps'] = time_steps
+
+            #update clusters
+            config['input']['data']['clusters'] = create_clusters(locations, gridsize)
+
+            # Save the updated configuration
+            with open(config_path, 'w') as file:
+                toml.dump(config, file)
 
-    # Generate new transmission data
-    transmission_data = []
+    if INDEX in stale:
+        with stage('dendrogram', path, path + INDEX):
+            write_dendrogram_index(path, create_clusters(locations, gridsize))
 
-    for i, location in enumerate(locations):
-        neighbors = get_neighbors(i+1, gridsize)
-        for neighbor in neighbors:
-            neighbor_location = f'l{neighbor}'
+    if stale & {artifacts['bidirectional'], artifacts['transmission_lines']}:
+        with stage('transmission', path, path + artifacts['bidirectional'], path + artifacts['transmission_lines']):
+            # Generate new transmission data, a line to the right and down from every location
+            side = int(np.sqrt(gridsize))
+            sources, targets = grid_edges(side, side)
+            names = location_names(gridsize, start=1)
             export_capacity = 2000
             import_capacity = 2000
-            transmission_data.append([location, neighbor_location, export_capacity, import_capacity])
-            
-    # Create DataFrame for transmission lines
-    transmission_df = pd.DataFrame(transmission_data, columns=['from', 'to', 'export_capacity', 'import_capacity'])
-    transmission_df.to_csv(inputpath + 'transmission_lines.csv', index=False)
-    
-    create_tomls(path, inputpath)
 
-    # Load the existing configuration
-    config_path = path + 'config.toml'
-    with open(config_path, 'r') as file:
-        config = toml.load(file)
-        
-    # Update the time_steps
-    config['input']['sets']['time_steps'] = time_steps
+            transmission_df = bidirectional_lines(sources, targets, export_capacity, import_capacity, names)
+            write_frames(inputpath + 'transmission_lines.csv', list(transmission_df.columns), [transmission_df], compress)
+
+            # the directional lines, with the import capacity from the neighbor and the export capacity to it
+            df_combined = to_directional(transmission_df)
+            if output_format == 'csv':
+                write_frames(inputpath + files['transmission_lines'], list(df_combined.columns), [df_combined], compress)
+            else:
+                df_combined.to_feather(inputpath + files['transmission_lines'])
+
+    update_manifest(path, keys)
+    if compress:
+        warn_compressed(path)
 
-    #update clusters
-    config['input']['data']['clusters'] = create_clusters(locations, gridsize)
+    return path
 
-    # Save the updated configuration
-    with open(config_path, 'w') as file:
-        toml.dump(config, file)
+def _generate_instance(job):
+    time, yeartime, gridsize, seed, name, seed_sequence, compress = job
+    start = perf_counter()
+    path = generate(time, yeartime, gridsize, seed, np.random.default_rng(seed_sequence), name, compress=compress)
+    return path, perf_counter() - start, profiling.take()
 
-    df_export = transmission_df[["from", "to", "export_capacity"]]
-    df_export = df_export.rename(columns={"export_capacity": "capacity"})
+#generates every (time, gridsize, seed) combination in parallel
+#every instance draws from its own stream spawned from root_seed in job order,
+#so the generated data does not depend on the number of workers or the completion order
+def sweep(times, yeartime, gridsizes, seeds, root_seed, workers=None, manifest_path='./case_studies/grid_sweep_manifest.json',
+          compress=False):
+    combinations = list(product(times, gridsizes, seeds))
+    seed_sequences = np.random.SeedSequence(root_seed).spawn(len(combinations))
 
-    df_import = transmission_df[["to", "from", "import_capacity"]]
-    df_import = df_import.rename(columns={"import_capacity": "capacity", "from": "to", "to": "from"})
+    jobs = []
+    for (time, gridsize, seed), seed_sequence in zip(combinations, seed_sequences):
+        # only add the gridsize to the folder name when it is part of the sweep, to keep the grid_{seed} layout
+        name = f'grid_{seed}' if len(gridsizes) == 1 else f'grid_{gridsize}_{seed}'
+        jobs.append((time, yeartime, gridsize, seed, name, seed_sequence, compress))
 
-    df_combined = pd.concat([df_import, df_export])
+    manifest = []
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_generate_instance, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            time, _, gridsize, seed, _, seed_sequence, _ = futures[future]
+            path, elapsed, profile = future.result()
+            print(f'[{done}/{len(jobs)}] {path} generated in {elapsed:.2f}s')
+            manifest.append({
+                'path': path,
+                'time_steps': time,
+                'gridsize': gridsize,
+                'seed': seed,
+                'spawn_key': list(seed_sequence.spawn_key),
+                'seconds': elapsed,
+            })
+            if profile:
+                manifest[-1]['profile'] = profile
 
-    df_combined.to_csv(inputpath + 'transmission_lines2.csv', index=False)
+    manifest.sort(key=lambda entry: (entry['seed'], entry['gridsize'], entry['time_steps']))
+    with open(manifest_path, 'w') as file:
+        json.dump({'root_seed': root_seed, 'instances': manifest}, file, indent=2)
+    print(f'generated {len(jobs)} instances in {perf_counter() - start:.2f}s, manifest: {manifest_path}')
+    if profiling.enabled():
+        profiling.dump(records=[record for entry in manifest for record in entry.get('profile', [])])
+    return manifest
 
 if __name__ == '__main__':
     seed = 600
-    np.random.seed(seed)
     #set the gridsize you want
     gridsize = 16
     yeartime = 8760
 
-    for i in range(50, 1001, 50):
-        generate(i, yeartime, gridsize, seed)
\ No newline at end of file
+    sweep(range(50, 1001, 50), yeartime, [gridsize], [seed], root_seed=seed)
@@ -2,6 +2,10 @@ import random
 import os
 from math import log2, ceil
 
+from case_study_cache import fingerprint, fingerprint_files, stale_artifacts, update_manifest
+from csv_writer import output_path, warn_compressed, write_rows
+from profiling import stage
+
 def get_clusters(locations):
     if len(locations) == 0:
         return []
@@ -20,10 +24,41 @@ def create_middle_cluster(n):
     return 0 if n == 0 else [create_middle_cluster(n-1)]
     
     
-def create_star_case_study(name, chain_length, degrees, time_steps):
+def get_artifact_keys(chain_length, degrees, time_steps, seed=None, compress=False):
+    "fingerprint of every input each artifact of a star case study is generated from"
+    source = fingerprint_files(__file__)
+    total_locations = chain_length*degrees + 1
+    # without a seed the line capacities differ on every run, so the lines are always regenerated
+    lines_seed = seed if seed is not None else os.urandom(16).hex()
+    return {
+        f'inputs/{output_path("demand.csv", compress)}': fingerprint(source, total_locations, time_steps),
+        f'inputs/{output_path("generation_availability.csv", compress)}': fingerprint(source),
+        f'inputs/{output_path("generation.csv", compress)}': fingerprint(source, total_locations),
+        f'inputs/{output_path("transmission_lines2.csv", compress)}': fingerprint(source, chain_length, degrees, lines_seed),
+        'inputs/scalars.toml': fingerprint(source),
+        'config.toml': fingerprint(source, chain_length, degrees),
+    }
+
+
+def create_star_case_study(name, chain_length, degrees, time_steps, seed=None, compress=False):
+    """
+    seed seeds the random line capacities, by default they differ on every run
+    compress gzips the CSV inputs, they have to be unpacked before main.jl can read them
+    """
+    rng = random.Random(seed)
     folder = f'case_studies/{name}'
     input_folder = f'{folder}/inputs'
 
+    # Only regenerate the artifacts whose inputs changed since the last run
+    keys = get_artifact_keys(chain_length, degrees, time_steps, seed, compress)
+    stale = stale_artifacts(folder, keys)
+    if not stale:
+        print(f'{folder} is up to date')
+        return
+
+    def artifact(file):
+        return f'inputs/{output_path(file, compress)}'
+
     # Create folders
     if not os.path.exists(folder):
         os.makedirs(folder)
@@ -47,54 +82,56 @@ def create_star_case_study(name, chain_length, degrees, time_steps):
     print(clusters)
         
     # Demands
-    demands = ["location,time_step,demand"]
-    for location in range(total_locations):
-        for time_step in range(time_steps):
-            demands.append(f"l{location},{time_step},100")
-
-    with open(f'{input_folder}/demand.csv', 'w+') as f:
-        f.write('\n'.join(demands) + '\n')
+    if artifact('demand.csv') in stale:
+        with stage('demand', folder, f'{folder}/{artifact("demand.csv")}'):
+            demands = (
+                (f"l{location}", time_step, 100)
+                for location in range(total_locations)
+                for time_step in range(time_steps)
+            )
+            write_rows(f'{input_folder}/demand.csv', ["location", "time_step", "demand"], demands, compress=compress)
 
 
     # Generation availability
-    generation_av = ["location,technology,time_step,availability"]
     # TODO add generation availability
-    with open(f'{input_folder}/generation_availability.csv', 'w+') as f:
-        f.write('\n'.join(generation_av) + '\n')
+    if artifact('generation_availability.csv') in stale:
+        with stage('availability', folder, f'{folder}/{artifact("generation_availability.csv")}'):
+            write_rows(f'{input_folder}/generation_availability.csv', ["location", "technology", "time_step", "availability"],
+                       [], compress=compress)
 
 
     # Generation
-    generation = ["technology,location,investment_cost,variable_cost,unit_capacity,ramping_rate"]
-
-    for location in range(total_locations):
-        generation.append(f"Gas,l{location},23.33333333,0.05,250,0.75")
-
-    with open(f'{input_folder}/generation.csv', 'w+') as f:
-        f.write('\n'.join(generation) + '\n')
+    if artifact('generation.csv') in stale:
+        with stage('generation', folder, f'{folder}/{artifact("generation.csv")}'):
+            generation = (("Gas", f"l{location}", 23.33333333, 0.05, 250, 0.75) for location in range(total_locations))
+            write_rows(f'{input_folder}/generation.csv',
+                       ["technology", "location", "investment_cost", "variable_cost", "unit_capacity", "ramping_rate"],
+                       generation, compress=compress)
 
     # transmission_lines
-    transmission_lines = ["from,to,capacity"]
-    for i in range(1, total_locations, chain_length):
-        transmission_lines.append(
-            f"l{0},l{i},{random.randint(1, 20) * 10}"
-        )
-        for j in range(0, chain_length-1):
-            transmission_lines.append(
-                f"l{i+j},l{i+j+1},{random.randint(1, 20) * 10}"
-            )            
-
-    with open(f'{input_folder}/transmission_lines2.csv', 'w+') as f:
-        f.write("\n".join(transmission_lines))
-
-    with open(f'{input_folder}/scalars.toml', 'w+') as f:
-        f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
+    if artifact('transmission_lines2.csv') in stale:
+        with stage('transmission', folder, f'{folder}/{artifact("transmission_lines2.csv")}'):
+            def star_lines():
+                for i in range(1, total_locations, chain_length):
+                    yield (f"l{0}", f"l{i}", rng.randint(1, 20) * 10)
+                    for j in range(0, chain_length-1):
+                        yield (f"l{i+j}", f"l{i+j+1}", rng.randint(1, 20) * 10)
+
+            write_rows(f'{input_folder}/transmission_lines2.csv', ["from", "to", "capacity"], star_lines(),
+                       compress=compress)
+
+    with stage('config', folder, f'{input_folder}/scalars.toml', f'{folder}/config.toml'):
+        if 'inputs/scalars.toml' in stale:
+            with open(f'{input_folder}/scalars.toml', 'w+') as f:
+                f.write("""# Value of lost load (cost of not supplying energy) [kEUR/MWh]
 value_of_lost_load = 3.0
 # If true, an LP relaxation of the problem will be solved
 relaxation = false
     """)
 
-    with open(f'{folder}/config.toml', 'w+') as f:
-        f.write(f"""[input.data]
+        if 'config.toml' in stale:
+            with open(f'{folder}/config.toml', 'w+') as f:
+                f.write(f"""[input.data]
 # input directory with the files
 dir = "inputs"
 demand = "demand.csv"
@@ -117,7 +154,12 @@ line_flow = "line_flow.csv"
 loss_of_load = "loss_of_load.csv"
 scalars = "scalars.toml"
                 """)
+
+    update_manifest(folder, keys)
+    if compress:
+        warn_compressed(folder)
     
-chain_length = 3
-degrees = 3
-create_star_case_study(f"{chain_length}_{degrees}_star", chain_length, degrees, 100)
+if __name__ == '__main__':
+    chain_length = 3
+    degrees = 3
+    create_star_case_study(f"{chain_length}_{degrees}_star", chain_length, degrees, 100)
@@ -1,29 +1,129 @@
+import numpy as np
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
-
-# Create a graph object
-df = pd.read_csv("case_studies/stylized_EU/inputs/transmission_lines.csv")
-G = nx.from_pandas_edgelist(df, 'from', 'to')
-
-print(G.edges())
-
-nx.draw(G, with_labels=True)
-# plt.show()
-
-#  start simple line detection algorithm in the graph
-lowest_degree_node = min(G.degree, key=lambda x: x[1])
-print(lowest_degree_node)
-print(type(lowest_degree_node))
-if lowest_degree_node[1] == 1:
-    line = [lowest_degree_node]
-    edges_of_lowest_degree_node = G.edges(lowest_degree_node)
-    print(edges_of_lowest_degree_node)
-    print(type(edges_of_lowest_degree_node))
-    next_node = list(edges_of_lowest_degree_node)[0][1]
-    print(next_node)
-    
-    #  Make sure that this is iterative until the next node has more than 2 degrees.
-else:
-    print("No nodes with 1 edge, no lines possible.")
 
+from case_study import CaseStudy
+
+
+def load_graph(path):
+    """
+    loads a transmission_lines*.csv file as an undirected graph, with the total capacity between two locations
+    as edge attribute 'capacity'
+
+    Both the directional (from,to,capacity) and the bidirectional (from,to,export_capacity,import_capacity)
+    format are supported, both directions and parallel lines are summed.
+    """
+    return graph_from_lines(pd.read_csv(path, encoding='utf-8-sig'))
+
+
+def graph_from_lines(df):
+    "the graph of load_graph from a transmission lines frame, e.g. CaseStudy(folder).lines"
+    if 'capacity' not in df:
+        df = df.assign(capacity=df['export_capacity'] + df['import_capacity'])
+
+    pairs = np.sort(df[['from', 'to']].to_numpy(dtype=str), axis=1)
+    df = pd.DataFrame({'from': pairs[:, 0], 'to': pairs[:, 1], 'capacity': df['capacity'].to_numpy()})
+    df = df[df['from'] != df['to']].groupby(['from', 'to'], as_index=False)['capacity'].sum()
+    return nx.from_pandas_edgelist(df, 'from', 'to', edge_attr='capacity')
+
+
+def find_pendant_trees(G):
+    """
+    finds every pendant tree (a tree hanging off the rest of the network by a single line) by peeling leaves
+
+    returns the removed locations, and per pendant tree a dict with its locations, the root location it hangs off
+    and the capacity of that line as bottleneck. Every branch of a root is a pendant tree of its own, so the arms of
+    a star are found separately. A component that is a tree is peeled up to one location, which becomes its root.
+    """
+    degree = dict(G.degree)
+    removed = set()
+    order = []
+    attach = {}
+    leaves = [node for node, d in degree.items() if d == 1]
+    while leaves:
+        node = leaves.pop()
+        if degree[node] != 1:
+            continue
+        neighbor = next(n for n in G.neighbors(node) if n not in removed)
+        removed.add(node)
+        order.append(node)
+        attach[node] = neighbor
+        degree[node] = 0
+        degree[neighbor] -= 1
+        if degree[neighbor] == 1:
+            leaves.append(neighbor)
+
+    # the top of the branch of every removed location, its parent is always removed after it
+    top = {}
+    for node in reversed(order):
+        top[node] = top[attach[node]] if attach[node] in removed else node
+
+    trees = {}
+    for node in order:
+        trees.setdefault(top[node], []).append(node)
+    pendant_trees = [{
+        'locations': locations[::-1],
+        'root': attach[branch],
+        'bottleneck': G.edges[branch, attach[branch]]['capacity'],
+    } for branch, locations in trees.items()]
+    return removed, pendant_trees
+
+
+def find_chains(G, removed=frozenset()):
+    """
+    finds every maximal chain of degree-2 locations in G without the removed locations (see find_pendant_trees)
+
+    returns per chain a dict with its locations in line order, the locations at both ends (None for a cycle)
+    and the capacity bottleneck (the smallest capacity of all lines from end to end)
+    """
+    def core_neighbors(node):
+        return [n for n in G.neighbors(node) if n not in removed]
+
+    visited = set()
+    chains = []
+    for start in G.nodes:
+        if start in removed or start in visited or len(core_neighbors(start)) != 2:
+            continue
+        visited.add(start)
+
+        # walk from start in both directions until a location that does not have degree 2
+        sides = []
+        for first in core_neighbors(start):
+            previous, node, side = start, first, []
+            while node not in visited and len(core_neighbors(node)) == 2:
+                visited.add(node)
+                side.append(node)
+                previous, node = node, next(n for n in core_neighbors(node) if n != previous)
+            sides.append((side, node))
+
+        (left, left_end), (right, right_end) = sides
+        locations = left[::-1] + [start] + right
+        cycle = left_end in locations or right_end in locations
+        path = locations + [locations[0]] if cycle else [left_end] + locations + [right_end]
+        chains.append({
+            'locations': locations,
+            'ends': None if cycle else (left_end, right_end),
+            'bottleneck': min(G.edges[a, b]['capacity'] for a, b in zip(path, path[1:])),
+        })
+    return chains
+
+
+def find_reduction_candidates(G):
+    """
+    finds all pendant trees and all maximal chains of the transmission graph, the cheapest merge clusters there are
+
+    returns a list of dicts with the kind ('pendant_tree' or 'chain'), the locations and the capacity bottleneck
+    """
+    removed, pendant_trees = find_pendant_trees(G)
+    return (
+        [{'kind': 'pendant_tree', **tree} for tree in pendant_trees] +
+        [{'kind': 'chain', **chain} for chain in find_chains(G, removed)]
+    )
+
+
+if __name__ == '__main__':
+    # Create a graph object
+    G = graph_from_lines(CaseStudy('case_studies/stylized_EU').lines)
+
+    for candidate in find_reduction_candidates(G):
+        print(candidate)
@@ -1,15 +1,121 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
+from case_study_cache import fingerprint_files
 
-df = pd.read_csv("case_studies/2_locations/inputs/transmission_lines.csv")
+# Converts the bidirectional transmission_lines.csv (from, to, export_capacity, import_capacity) of case studies
+# to the directional transmission_lines2.csv (from, to, capacity) used with line_capacities_bidirectional = false.
+#
+# Some case studies ship a hand-made transmission_lines2.csv, so an existing output is only replaced when the
+# converter wrote it: the hash of every written file is recorded in directional_manifest.json next to it, and a
+# file that changed since or was never recorded is left alone. An unrecorded file that is exactly the conversion
+# of its input (e.g. written by an older converter or the grid generator) is recorded and managed from then on.
 
-df_export = df[["from", "to", "export_capacity"]]
-df_export = df_export.rename(columns={"export_capacity": "capacity"})
+BIDIRECTIONAL = 'transmission_lines.csv'
+DIRECTIONAL = 'transmission_lines2.csv'
+MANIFEST = 'directional_manifest.json'
 
-df_import = df[["to", "from", "import_capacity"]]
-df_import = df_import.rename(columns={"import_capacity": "capacity", "from": "to", "to": "from"})
+CONVERTED = 'converted'
+UP_TO_DATE = 'up to date'
+NOT_CONVERTED = 'not written by the converter, kept'
 
-df_combined = pd.concat([df_import, df_export])
 
-df_combined.to_csv("case_studies/2_locations/inputs/transmission_lines2.csv", index=False)
\ No newline at end of file
+def to_directional(df):
+    """
+    directional lines of a bidirectional transmission lines frame
+
+    Every line gives an import line (to -> from) and an export line (from -> to), all import lines come first.
+    Parallel lines in the same direction are merged by summing their capacity (in order of first appearance)
+    and directions without capacity are dropped.
+    """
+    if 'capacity' in df:
+        lines = df[['from', 'to', 'capacity']]
+    else:
+        lines = pd.concat([
+            pd.DataFrame({'from': df['to'], 'to': df['from'], 'capacity': df['import_capacity']}),
+            pd.DataFrame({'from': df['from'], 'to': df['to'], 'capacity': df['export_capacity']}),
+        ], ignore_index=True)
+    lines = lines.groupby(['from', 'to'], sort=False, as_index=False)['capacity'].sum()
+    return lines[lines['capacity'] > 0].reset_index(drop=True)
+
+
+def load_manifest(folder):
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(output_path):
+    "stores the hash of output_path in the manifest of its folder, marking it as written by the converter"
+    folder, name = os.path.split(output_path)
+    manifest = load_manifest(folder)
+    manifest[name] = fingerprint_files(output_path)
+    with open(os.path.join(folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def convert_file(input_path, output_path=None, force=False):
+    """
+    writes the directional lines of input_path to output_path (default transmission_lines2.csv next to it)
+
+    An existing output is kept when it is newer than the input (unless force is set) and always when it was not
+    written by the converter. returns CONVERTED, UP_TO_DATE or NOT_CONVERTED
+    """
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(input_path), DIRECTIONAL)
+    lines = None
+    if os.path.exists(output_path):
+        folder, name = os.path.split(output_path)
+        if load_manifest(folder).get(name) != fingerprint_files(output_path):
+            lines = to_directional(pd.read_csv(input_path, encoding='utf-8-sig'))
+            if not pd.read_csv(output_path, encoding='utf-8-sig').equals(lines):
+                return NOT_CONVERTED
+            record(output_path)
+        if not force and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+            return UP_TO_DATE
+    if lines is None:
+        lines = to_directional(pd.read_csv(input_path, encoding='utf-8-sig'))
+    lines.to_csv(output_path, index=False)
+    record(output_path)
+    return CONVERTED
+
+
+def find_transmission_lines(roots):
+    "every transmission_lines.csv under the root folders, in a fixed order"
+    paths = []
+    for root in roots:
+        for directory, folders, files in os.walk(root):
+            folders.sort()
+            if BIDIRECTIONAL in files:
+                paths.append(os.path.join(directory, BIDIRECTIONAL))
+    return paths
+
+
+def _convert(job):
+    input_path, force = job
+    return convert_file(input_path, force=force)
+
+
+def convert_tree(roots=('case_studies',), workers=None, force=False):
+    """
+    converts every transmission_lines.csv under the root folders in parallel, skipping the up to date ones and
+    the hand-made outputs
+
+    returns the list of converted input files
+    """
+    paths = find_transmission_lines(roots)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        statuses = list(executor.map(_convert, [(path, force) for path in paths]))
+    for path, status in zip(paths, statuses):
+        print(f'{path}: {status}')
+    return [path for path, status in zip(paths, statuses) if status == CONVERTED]
+
+
+if __name__ == '__main__':
+    convert_tree(sys.argv[1:] or ['case_studies'])
@@ -0,0 +1,288 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import toml
+
+from case_study import CaseStudy
+from dendrogram_index import INDEX, build_dendrogram_index, get_level_clusters, get_levels, load_dendrogram_index
+from reduction import cluster_name
+
+# Summaries of the outputs main.jl writes for a case study (the [output] files of config.toml). The time dependent
+# outputs (production, line flow, loss of load) can have a row per generator or line and time step, so they are read
+# in chunks and every chunk is reduced to partial sums, maxima and counts per generator, line or location right away.
+# The model leaves out the rows with value 0, those count as 0 here as well.
+#
+# The per cluster summary uses the names of reduction.cluster_name, so the clusters of a level of the full solution
+# line up with the locations of the reduced case study of that level, see compare_reduction.
+#
+#   python scripts/postprocess_outputs.py case_studies/8_locations
+#
+# writes to {output dir}/summary:
+#   capacity_factors.csv    location, technology, capacity, production, peak_production, hours, capacity_factor
+#   line_congestion.csv     from, to, capacity, flow, peak_flow, hours, utilization, congestion_hours
+#   loss_of_load.csv        location, demand, loss_of_load, share, peak_loss_of_load, hours
+#   clusters.csv            level, cluster, size, capacity, production, demand, loss_of_load, cut_capacity, cut_flow
+#   summary.toml            totals over the whole system
+
+SUMMARY = 'summary'
+CHUNK_SIZE = 1_000_000
+# a line is congested in a time step when its flow is within this fraction of its capacity
+CONGESTION_TOLERANCE = 1e-6
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    "the CSV at path in chunks, an empty file gives one empty chunk with its columns"
+    reader = pd.read_csv(path, encoding='utf-8-sig', chunksize=chunk_size)
+    empty = True
+    for chunk in reader:
+        empty = False
+        yield chunk
+    if empty:
+        yield pd.read_csv(path, encoding='utf-8-sig', nrows=0)
+
+
+def aggregate_chunks(chunks, keys, value, limit=None):
+    """
+    per keys the total, the peak and the number of rows with a nonzero value, combined over all chunks
+
+    limit is an optional function of a chunk giving the capacity of every row, the rows within
+    CONGESTION_TOLERANCE of it are counted as congested. value is summed in absolute value.
+    """
+    partials = []
+    for chunk in chunks:
+        values = chunk[value].abs()
+        columns = {'total': values, 'peak': values, 'hours': values > 0}
+        if limit is not None:
+            columns['congested'] = values >= limit(chunk) * (1 - CONGESTION_TOLERANCE)
+        partial = pd.DataFrame({**{key: chunk[key] for key in keys}, **columns})
+        partials.append(partial.groupby(keys, sort=False).agg(
+            total=('total', 'sum'), peak=('peak', 'max'), hours=('hours', 'sum'),
+            **({'congested': ('congested', 'sum')} if limit is not None else {})))
+    combined = pd.concat(partials)
+    aggregations = {'total': 'sum', 'peak': 'max', 'hours': 'sum'}
+    if limit is not None:
+        aggregations['congested'] = 'sum'
+    return combined.groupby(level=list(range(len(keys))), sort=False).agg(aggregations)
+
+
+def get_time_steps(case, demand_time_steps):
+    "the number of time steps of the model, from the config or (auto) the time steps of the demand"
+    time_steps = case.sets_config.get('time_steps', 'auto')
+    if time_steps == 'auto':
+        return len(demand_time_steps)
+    return len(time_steps)
+
+
+def get_line_capacities(case):
+    "capacity of every line in the direction of the line (export) and against it (import)"
+    lines = case.lines.astype({'from': str, 'to': str})
+    if case.bidirectional:
+        lines = lines.rename(columns={'export_capacity': 'capacity'})
+    else:
+        lines = lines.assign(import_capacity=0.0)
+    lines = lines.groupby(['from', 'to'], sort=False, as_index=False)[['capacity', 'import_capacity']].sum()
+    return lines.set_index(['from', 'to'])
+
+
+def get_cluster_index(case):
+    "the dendrogram index of the case study, None when it has no cluster tree"
+    if os.path.exists(os.path.join(case.folder, INDEX)):
+        return load_dendrogram_index(case.folder)
+    if case.clusters:
+        return build_dendrogram_index(case.clusters)
+    return None
+
+
+def summarize_outputs(folder, output_folder=None, chunk_size=CHUNK_SIZE):
+    """
+    writes the summaries of the outputs of the case study in folder (see the top of this file)
+
+    inputs:
+        folder:         [string]    case study folder with a config.toml and the outputs of main.jl
+        output_folder:  [string]    default {output dir}/summary
+    returns the summary frames as a dict
+    """
+    case = CaseStudy(folder)
+    output_config = case.config['output']
+    output_dir = os.path.join(folder, output_config['dir'])
+    if output_folder is None:
+        output_folder = os.path.join(output_dir, SUMMARY)
+
+    def output(key):
+        return read_chunks(os.path.join(output_dir, output_config[key]), chunk_size)
+
+    # demand per location and the time steps, streamed as well since it is as long as the outputs
+    demand_parts, demand_time_steps = [], set()
+    for chunk in read_chunks(case.path('demand'), chunk_size):
+        demand_parts.append(chunk.groupby(chunk['location'].astype(str), sort=False)['demand'].sum())
+        demand_time_steps.update(chunk['time_step'].unique())
+    demand = pd.concat(demand_parts).groupby(level=0, sort=False).sum()
+    time_steps = get_time_steps(case, demand_time_steps)
+
+    # capacity factors
+    investment = pd.read_csv(os.path.join(output_dir, output_config['investment']), encoding='utf-8-sig')
+    investment = investment.astype({'location': str, 'technology': str})
+    capacity = investment.groupby(['location', 'technology'], sort=False)['capacity'].sum()
+    production = aggregate_chunks((chunk.astype({'location': str, 'technology': str})
+                                   for chunk in output('production')), ['location', 'technology'], 'production')
+    generators = capacity.index.union(production.index)
+    production = production.reindex(generators, fill_value=0)
+    capacity = capacity.reindex(generators, fill_value=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        capacity_factor = np.where(capacity > 0, production['total'] / (capacity * time_steps), np.nan)
+    capacity_factors = pd.DataFrame({
+        'capacity': capacity,
+        'production': production['total'],
+        'peak_production': production['peak'],
+        'hours': production['hours'],
+        'capacity_factor': capacity_factor,
+    }, index=generators).reset_index()
+
+    # congestion, the flow on a line is limited by its capacity when positive and its import capacity when negative
+    capacities = get_line_capacities(case)
+
+    def limit(chunk):
+        index = pd.MultiIndex.from_arrays([chunk['from'], chunk['to']])
+        aligned = capacities.reindex(index)
+        return np.where(chunk['flow'] >= 0, aligned['capacity'], aligned['import_capacity'])
+
+    flows = aggregate_chunks((chunk.astype({'from': str, 'to': str}) for chunk in output('line_flow')),
+                             ['from', 'to'], 'flow', limit)
+    lines = capacities.index.union(flows.index)
+    flows = flows.reindex(lines, fill_value=0)
+    line_capacity = capacities['capacity'].reindex(lines, fill_value=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        utilization = np.where(line_capacity > 0, flows['total'] / (line_capacity * time_steps), np.nan)
+    line_congestion = pd.DataFrame({
+        'capacity': line_capacity,
+        'flow': flows['total'],
+        'peak_flow': flows['peak'],
+        'hours': flows['hours'],
+        'utilization': utilization,
+        'congestion_hours': flows['congested'],
+    }, index=lines).reset_index()
+
+    # loss of load, per location and the hours in which any location sheds load
+    loss_time_steps = set()
+
+    def loss_chunks():
+        for chunk in output('loss_of_load'):
+            loss_time_steps.update(chunk.loc[chunk['loss_of_load'] > 0, 'time_step'].unique())
+            yield chunk.astype({'location': str})
+
+    loss = aggregate_chunks(loss_chunks(), ['location'], 'loss_of_load')
+    locations = demand.index.union(loss.index)
+    loss = loss.reindex(locations, fill_value=0)
+    location_demand = demand.reindex(locations, fill_value=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(location_demand > 0, loss['total'] / location_demand, np.nan)
+    loss_of_load = pd.DataFrame({
+        'demand': location_demand,
+        'loss_of_load': loss['total'],
+        'share': share,
+        'peak_loss_of_load': loss['peak'],
+        'hours': loss['hours'],
+    }, index=pd.Index(locations, name='location')).reset_index()
+
+    clusters = summarize_clusters(get_cluster_index(case), capacity_factors, line_congestion, loss_of_load)
+
+    summary = {
+        'time_steps': time_steps,
+        'capacity': float(capacity_factors['capacity'].sum()),
+        'production': float(capacity_factors['production'].sum()),
+        'demand': float(loss_of_load['demand'].sum()),
+        'loss_of_load': float(loss_of_load['loss_of_load'].sum()),
+        'loss_of_load_hours': len(loss_time_steps),
+        'congestion_hours': int(line_congestion['congestion_hours'].sum()),
+        'congested_lines': int((line_congestion['congestion_hours'] > 0).sum()),
+    }
+    if summary['capacity'] > 0:
+        summary['capacity_factor'] = summary['production'] / (summary['capacity'] * time_steps)
+
+    os.makedirs(output_folder, exist_ok=True)
+    capacity_factors.to_csv(os.path.join(output_folder, 'capacity_factors.csv'), index=False)
+    line_congestion.to_csv(os.path.join(output_folder, 'line_congestion.csv'), index=False)
+    loss_of_load.to_csv(os.path.join(output_folder, 'loss_of_load.csv'), index=False)
+    if clusters is not None:
+        clusters.to_csv(os.path.join(output_folder, 'clusters.csv'), index=False)
+    with open(os.path.join(output_folder, 'summary.toml'), 'w') as f:
+        toml.dump(summary, f)
+
+    return {'capacity_factors': capacity_factors, 'line_congestion': line_congestion,
+            'loss_of_load': loss_of_load, 'clusters': clusters, 'summary': summary}
+
+
+def summarize_clusters(index, capacity_factors, line_congestion, loss_of_load):
+    """
+    per level of the cluster tree and per cluster: the capacity, production, demand and loss of load of its locations,
+    and the capacity and flow of the lines that leave it (the cut to the other clusters). None without a cluster tree
+    """
+    if index is None or get_levels(index) == 0:
+        return None
+    codes = pd.Series(np.arange(len(index['locations'])), index=index['locations'])
+
+    def location_codes(locations):
+        "position of every location in the index, -1 for locations that are not in the cluster tree"
+        return codes.reindex(locations.astype(str)).fillna(-1).to_numpy(dtype=np.int64)
+
+    per_location = {
+        'capacity': (location_codes(capacity_factors['location']), capacity_factors['capacity']),
+        'production': (location_codes(capacity_factors['location']), capacity_factors['production']),
+        'demand': (location_codes(loss_of_load['location']), loss_of_load['demand']),
+        'loss_of_load': (location_codes(loss_of_load['location']), loss_of_load['loss_of_load']),
+    }
+    line_from = location_codes(line_congestion['from'])
+    line_to = location_codes(line_congestion['to'])
+
+    frames = []
+    for level in range(1, get_levels(index) + 1):
+        labels = index['labels'][level - 1]
+        clusters = get_level_clusters(index, level)
+        columns = {}
+        for column, (locations, values) in per_location.items():
+            known = locations >= 0
+            columns[column] = np.bincount(labels[locations[known]], weights=values.to_numpy(dtype=float)[known],
+                                          minlength=len(clusters))
+        # lines between two clusters count for the cluster they leave
+        known = (line_from >= 0) & (line_to >= 0)
+        source = labels[line_from[known]]
+        cut = source != labels[line_to[known]]
+        for column, values in (('cut_capacity', line_congestion['capacity']), ('cut_flow', line_congestion['flow'])):
+            columns[column] = np.bincount(source[cut], weights=values.to_numpy(dtype=float)[known][cut],
+                                          minlength=len(clusters))
+        frames.append(pd.DataFrame({
+            'level': level,
+            'cluster': [cluster_name(cluster) for cluster in clusters],
+            'size': [len(cluster) for cluster in clusters],
+            **columns,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def compare_reduction(folder, reduced_folder, level):
+    """
+    the capacity, production, demand and loss of load per cluster of the full solution of the case study in folder
+    next to those of the solution of its reduced case study at level (see reduction.reduce_case_study),
+    both have to be summarized with summarize_outputs first
+    """
+    def summary_folder(case_folder):
+        config = toml.load(os.path.join(case_folder, 'config.toml'))
+        return os.path.join(case_folder, config['output']['dir'], SUMMARY)
+
+    full = pd.read_csv(os.path.join(summary_folder(folder), 'clusters.csv'))
+    full = full[full['level'] == level].drop(columns=['level', 'size', 'cut_capacity', 'cut_flow'])
+
+    reduced_folder_summary = summary_folder(reduced_folder)
+    generation = pd.read_csv(os.path.join(reduced_folder_summary, 'capacity_factors.csv'))
+    loss = pd.read_csv(os.path.join(reduced_folder_summary, 'loss_of_load.csv'))
+    reduced = (generation.groupby('location')[['capacity', 'production']].sum()
+               .join(loss.set_index('location')[['demand', 'loss_of_load']], how='outer').fillna(0))
+    reduced = reduced.rename_axis('cluster').reset_index()
+    return full.merge(reduced, on='cluster', how='outer', suffixes=('', '_reduced'))
+
+
+if __name__ == '__main__':
+    for folder in sys.argv[1:] or ['case_studies/8_locations']:
+        print(toml.dumps(summarize_outputs(folder)['summary']))
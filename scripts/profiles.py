@@ -0,0 +1,150 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from case_study_cache import fingerprint_files
+
+# Library of seasonal availability profiles: the mean and std of the availability of every variable technology per
+# month and hour of the day (and optionally per location), computed in one chunked pass over an availability file
+# and stored as a small NumPy archive. The generators look up the profile of every time step in it instead of
+# rereading and regrouping the source file. The archive is loaded once per process, and again when it is rebuilt.
+#
+# Without an archive the SunPV profile falls back to the hour of day statistics of sun_distribution.csv, the other
+# technologies keep their constant mean and std.
+
+LIBRARY = 'profile_library.npz'
+SUN_DISTRIBUTION = 'sun_distribution.csv'
+
+MONTH_STARTS = np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def month_and_hour(time_steps):
+    """
+    (month 0..11, hour 0..23) of every time step, hour = time_step % 24 like sun_distribution.csv,
+    a horizon longer than a year wraps around
+    """
+    time_steps = np.asarray(time_steps)
+    day = (time_steps // 24) % 365
+    return np.searchsorted(MONTH_STARTS, day, side='right') - 1, time_steps % 24
+
+
+def build_profile_library(source, output=LIBRARY, per_location=False, chunk_size=1_000_000):
+    """
+    computes the month x hour profiles of every technology in the availability file source and writes them to output
+
+    The file is read in chunks of chunk_size rows, per chunk only the counts, sums and sums of squares per
+    (technology, location, month, hour) are accumulated. Month and hour combinations without data (a source shorter
+    than a year) get the statistics of that hour over all months.
+
+    inputs:
+        source:         [string]    generation_availability.csv with location, technology, time_step, availability
+        output:         [string]    the .npz archive
+        per_location:   [bool]      also store the profiles of every location
+    returns the path of the archive
+    """
+    technologies, locations = {}, {}
+    count = total = squares = np.zeros((0, 0, 12, 24))
+
+    for chunk in pd.read_csv(source, encoding='utf-8-sig', chunksize=chunk_size,
+                             usecols=['location', 'technology', 'time_step', 'availability']):
+        for value in chunk['technology'].unique():
+            technologies.setdefault(value, len(technologies))
+        for value in chunk['location'].unique():
+            locations.setdefault(value, len(locations))
+        shape = (len(technologies), len(locations), 12, 24)
+        if count.shape != shape:
+            count, total, squares = (np.pad(array, [(0, new - old) for new, old in zip(shape, array.shape)])
+                                     for array in (count, total, squares))
+
+        month, hour = month_and_hour(chunk['time_step'].to_numpy())
+        cell = np.ravel_multi_index((chunk['technology'].map(technologies).to_numpy(),
+                                     chunk['location'].map(locations).to_numpy(), month, hour), shape)
+        availability = chunk['availability'].to_numpy(dtype=float)
+        size = count.size
+        count += np.bincount(cell, minlength=size).reshape(shape)
+        total += np.bincount(cell, weights=availability, minlength=size).reshape(shape)
+        squares += np.bincount(cell, weights=availability ** 2, minlength=size).reshape(shape)
+
+    arrays = {'technologies': np.array(list(technologies), dtype=str)}
+    arrays['mean'], arrays['std'] = _statistics(count.sum(axis=1), total.sum(axis=1), squares.sum(axis=1))
+    arrays['count'] = count.sum(axis=1)
+    if per_location:
+        arrays['locations'] = np.array(list(locations), dtype=str)
+        arrays['location_mean'], arrays['location_std'] = _statistics(count, total, squares)
+    np.savez_compressed(output, **arrays)
+    return output
+
+
+def _statistics(count, total, squares):
+    "mean and sample std (ddof 1, like pandas) per cell, empty months get the statistics of the hour over all months"
+    hours = count.sum(axis=-2, keepdims=True), total.sum(axis=-2, keepdims=True), squares.sum(axis=-2, keepdims=True)
+    count, total, squares = (np.where(count == 0, hour, array) for hour, array in zip(hours, (count, total, squares)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, 0)
+        variance = np.where(count > 1, (squares - count * mean ** 2) / (count - 1), 0)
+    return mean, np.sqrt(np.maximum(variance, 0))
+
+
+def write_sun_distribution(library=LIBRARY, output=SUN_DISTRIBUTION):
+    "writes the hour of day SunPV statistics over the whole year (the old sun_distribution.csv) from the library"
+    arrays = load_profile_library(library)
+    t = list(arrays['technologies']).index('SunPV')
+    count, mean, std = arrays['count'][t], arrays['mean'][t], arrays['std'][t]
+    # pool the months of every hour
+    n = count.sum(axis=0)
+    hour_mean = (count * mean).sum(axis=0) / np.maximum(n, 1)
+    m2 = ((count - 1).clip(0) * std ** 2 + count * mean ** 2).sum(axis=0) - n * hour_mean ** 2
+    hour_std = np.sqrt(np.maximum(m2, 0) / np.maximum(n - 1, 1))
+    pd.DataFrame({'hour': np.arange(24), 'mean': hour_mean, 'std': hour_std}).to_csv(output, index=False)
+    return output
+
+
+def load_profile_library(path=LIBRARY):
+    "the arrays of the archive, read once per process (and again when the file changed)"
+    return _load(os.path.abspath(path), os.path.getmtime(path))
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime):
+    with np.load(path) as archive:
+        return {key: archive[key] for key in archive.files}
+
+
+@lru_cache(maxsize=8)
+def _load_sun_distribution(path, mtime):
+    df = pd.read_csv(path)
+    return df['mean'].to_numpy(), df['std'].to_numpy()
+
+
+def get_profile(technology, time_steps, location=None, library=LIBRARY, sun_distribution=SUN_DISTRIBUTION):
+    """
+    mean and std of the availability of technology at every time step, or None when there is no profile for it
+
+    inputs:
+        time_steps: [array]     the time steps, e.g. 1..T
+        location:   [string]    profile of this location of the library (needs a library built with per_location)
+    """
+    time_steps = np.asarray(time_steps)
+    if os.path.exists(library):
+        arrays = load_profile_library(library)
+        technologies = list(arrays['technologies'])
+        if technology in technologies:
+            month, hour = month_and_hour(time_steps)
+            t = technologies.index(technology)
+            if location is None:
+                return arrays['mean'][t, month, hour], arrays['std'][t, month, hour]
+            assert 'locations' in arrays, f"{library} has no per location profiles"
+            l = list(arrays['locations']).index(location)
+            return arrays['location_mean'][t, l, month, hour], arrays['location_std'][t, l, month, hour]
+
+    if technology == 'SunPV' and location is None and os.path.exists(sun_distribution):
+        mean, std = _load_sun_distribution(os.path.abspath(sun_distribution), os.path.getmtime(sun_distribution))
+        return mean[time_steps % 24], std[time_steps % 24]
+    return None
+
+
+def profile_fingerprint(library=LIBRARY, sun_distribution=SUN_DISTRIBUTION):
+    "hash of this module and the profile files the generators read, for the artifact fingerprints of case_study_cache"
+    return fingerprint_files(__file__, *(path for path in (library, sun_distribution) if os.path.exists(path)))
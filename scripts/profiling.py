@@ -0,0 +1,97 @@
+import json
+import os
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+
+# Opt-in instrumentation of the case study generators. Every generator wraps its stages (demand, availability,
+# generation, transmission, config) in stage(), which records the wall time, the bytes written to the files of the
+# stage and the peak memory allocated during the stage. Profiling is off unless the environment variable GEN_PROFILE
+# is set (to anything but 0) or enable() is called; if GEN_PROFILE ends with .json, dump() writes to that path.
+#
+# The peak memory is measured with tracemalloc, which slows down allocation heavy stages, so the timings of a
+# profiled run are an upper bound. The throughput benchmark (benchmark_generators.py) runs without profiling.
+
+ENVIRONMENT_VARIABLE = 'GEN_PROFILE'
+
+_records = []
+
+
+def enabled():
+    return os.environ.get(ENVIRONMENT_VARIABLE, '') not in ('', '0')
+
+
+def enable(path=None):
+    "turns profiling on, also for worker processes started afterwards (they inherit the environment)"
+    os.environ[ENVIRONMENT_VARIABLE] = path if path is not None else '1'
+
+
+@contextmanager
+def stage(name, case_study, *paths):
+    """
+    records the time, bytes written and peak memory of the code in the with block
+
+    inputs:
+        name:       [string]    stage name, e.g. 'demand'
+        case_study: [string]    folder of the case study that is generated
+        paths:      [string]    files written by the stage, their sizes after the stage are the bytes written
+    """
+    if not enabled():
+        yield
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = perf_counter()
+    yield
+    seconds = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    _records.append({
+        'case_study': case_study,
+        'stage': name,
+        'seconds': seconds,
+        'bytes_written': sum(os.path.getsize(path) for path in paths if os.path.exists(path)),
+        'peak_memory': peak - memory_before,
+    })
+
+
+def take():
+    "returns the records of this process and clears them, e.g. to send them back from a worker process"
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def summarize(records):
+    "total seconds and bytes written and the largest peak memory per stage"
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'bytes_written': 0, 'peak_memory': 0})
+        total['calls'] += 1
+        total['seconds'] += record['seconds']
+        total['bytes_written'] += record['bytes_written']
+        total['peak_memory'] = max(total['peak_memory'], record['peak_memory'])
+    return totals
+
+
+def dump(path=None, records=None):
+    """
+    writes the records (default the records of this process) and their summary as JSON
+
+    path defaults to the value of GEN_PROFILE if that ends with .json, otherwise the summary is only printed
+    """
+    if records is None:
+        records = list(_records)
+    if path is None and os.environ.get(ENVIRONMENT_VARIABLE, '').endswith('.json'):
+        path = os.environ[ENVIRONMENT_VARIABLE]
+
+    summary = summarize(records)
+    for name, total in summary.items():
+        print(f"{name:>14}: {total['seconds']:8.3f}s {total['bytes_written'] / 1e6:10.2f} MB written "
+              f"{total['peak_memory'] / 1e6:10.2f} MB peak ({total['calls']} calls)")
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump({'summary': summary, 'records': records}, f, indent=2)
+    return summary
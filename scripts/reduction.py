@@ -0,0 +1,142 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import toml
+
+from case_study import CaseStudy
+from dendrogram_index import (INDEX, build_dendrogram_index, get_level_clusters, get_level_parents, get_levels,
+                              get_reduced_tree, load_dendrogram_index)
+
+# Python counterpart of GenerationExpansionPlanning/src/reduction.jl. Instead of reducing the data at solve time,
+# every level of the cluster tree is reduced up front and written as its own case study.
+
+GENERATION_COLUMNS = ['investment_cost', 'variable_cost', 'unit_capacity', 'ramping_rate']
+
+
+def cluster_name(cluster):
+    return '_'.join(cluster)
+
+
+def aggregate(frame, labels, keys, sums):
+    "replaces the location codes in column 'cluster' by labels and sums the columns in sums per cluster and keys"
+    frame = frame.assign(cluster=labels[frame['cluster'].to_numpy()])
+    return frame.groupby(['cluster', *keys], sort=False, as_index=False)[sums].sum()
+
+
+def reduce_frames(demand, availability, generation, lines, index, weighted=False):
+    """
+    reduces the input frames to every level of the dendrogram index
+
+    Every level is aggregated from the previous (already reduced) level instead of from the full data.
+    Like reduction.jl, the availability and the generation parameters of a cluster are the mean of the means of
+    the clusters it merges. With weighted, averages are carried as sums and counts instead, so they stay equal to
+    the averages over the original locations.
+    yields (clusters, reduced cluster tree, (demand, availability, generation, lines)) per level
+    """
+    codes = pd.Series(np.arange(len(index['locations'])), index=index['locations'])
+    demand = demand.assign(cluster=codes.loc[demand['location']].to_numpy())
+    availability = availability.assign(cluster=codes.loc[availability['location']].to_numpy(), count=1)
+    generation = generation.assign(cluster=codes.loc[generation['location']].to_numpy(), count=1)
+    lines = lines.assign(cluster=codes.loc[lines['from']].to_numpy(), to_cluster=codes.loc[lines['to']].to_numpy())
+
+    for level in range(1, get_levels(index) + 1):
+        # the clusters of the first level are formed out of locations, every next level out of the clusters before
+        labels = index['labels'][0] if level == 1 else get_level_parents(index, level - 1)
+
+        demand = aggregate(demand, labels, ['time_step'], ['demand'])
+        availability = aggregate(availability, labels, ['technology', 'time_step'], ['availability', 'count'])
+        generation = aggregate(generation, labels, ['technology'], [*GENERATION_COLUMNS, 'count'])
+        lines = lines.assign(to_cluster=labels[lines['to_cluster'].to_numpy()])
+        lines = aggregate(lines, labels, ['to_cluster'], ['capacity'])
+        lines = lines[lines['cluster'] != lines['to_cluster']]
+
+        if not weighted:
+            # the clusters of the next level average these means, whatever the number of locations behind them
+            availability = availability.assign(availability=availability['availability'] / availability['count'], count=1)
+            generation = generation.assign(**{column: generation[column] / generation['count']
+                                              for column in GENERATION_COLUMNS}, count=1)
+
+        clusters = get_level_clusters(index, level)
+        names = np.array([cluster_name(cluster) for cluster in clusters])
+        yield clusters, get_reduced_tree(index, level, names.tolist()), (
+            pd.DataFrame({
+                'location': names[demand['cluster']],
+                'time_step': demand['time_step'],
+                'demand': demand['demand'],
+            }).sort_values(['location', 'time_step']),
+            pd.DataFrame({
+                'location': names[availability['cluster']],
+                'technology': availability['technology'],
+                'time_step': availability['time_step'],
+                'availability': availability['availability'] / availability['count'],
+            }).sort_values(['location', 'technology', 'time_step']),
+            pd.DataFrame({
+                'technology': generation['technology'],
+                'location': names[generation['cluster']],
+                **{column: generation[column] / generation['count'] for column in GENERATION_COLUMNS},
+            }).sort_values(['technology', 'location']),
+            pd.DataFrame({
+                'from': names[lines['cluster']],
+                'to': names[lines['to_cluster']],
+                'capacity': lines['capacity'],
+            }).sort_values(['from', 'to']),
+        )
+
+
+def reduce_case_study(folder, output_folder=None, weighted=False):
+    """
+    writes the reduced inputs of every level of the cluster tree of a case study
+
+    inputs:
+        folder:         [string]    case study folder with a config.toml
+        output_folder:  [string]    where the reduced case studies are written, default {folder}/reduced
+        weighted:       [bool]      average over the original locations instead of the clusters, see reduce_frames
+
+    Level i is written to {output_folder}/level_{i} as a case study of its own, with the clusters as locations
+    and the remaining cluster tree (in cluster names) as clusters. level_1 is the finest reduction.
+    returns the list of written config.toml paths
+    """
+    if output_folder is None:
+        output_folder = os.path.join(folder, 'reduced')
+
+    case = CaseStudy(folder)
+    data_config = case.data_config
+    assert case.clusters is not None, f"{os.path.join(folder, 'config.toml')} has no clusters; nothing to reduce"
+    assert not case.bidirectional, "reductions are only possible with directional line capacities"
+
+    demand = case.demand
+    availability = case.availability
+    generation = case.generation
+    lines = case.lines
+
+    # use the dendrogram index written by the generator, or build it when the case study has none
+    if os.path.exists(os.path.join(folder, INDEX)):
+        index = load_dendrogram_index(folder)
+    else:
+        index = build_dendrogram_index(case.clusters)
+
+    configs = []
+    frames = reduce_frames(demand, availability, generation, lines, index, weighted)
+    for level, (clusters, reduced_tree, tables) in enumerate(frames, 1):
+        level_folder = os.path.join(output_folder, f'level_{level}')
+        level_input_folder = os.path.join(level_folder, data_config['dir'])
+        os.makedirs(level_input_folder, exist_ok=True)
+
+        for key, table in zip(['demand', 'generation_availability', 'generation', 'transmission_lines'], tables):
+            table.to_csv(os.path.join(level_input_folder, data_config[key]), index=False)
+        shutil.copy(case.path('scalars'), os.path.join(level_input_folder, data_config['scalars']))
+
+        level_config = toml.load(os.path.join(folder, 'config.toml'))
+        level_config['input']['data']['clusters'] = reduced_tree
+        with open(os.path.join(level_folder, 'config.toml'), 'w') as f:
+            toml.dump(level_config, f)
+        configs.append(os.path.join(level_folder, 'config.toml'))
+        print(f'level {level}: {len(clusters)} clusters written to {level_folder}')
+
+    return configs
+
+
+if __name__ == '__main__':
+    reduce_case_study('case_studies/grid_42/50_steps')
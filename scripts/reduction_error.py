@@ -0,0 +1,209 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from case_study import CaseStudy
+from clustering import create_clusters
+from dendrogram_index import build_dendrogram_index, get_levels
+from load_input_as_graph import graph_from_lines
+from parse_transmission_lines_directional import to_directional
+from reduction import GENERATION_COLUMNS
+
+# Estimates how much a cluster tree loses at every reduction level from the inputs alone, without solving.
+# reduction.jl (and reduction.py) sum the demand, average the availability and the generation parameters over
+# the locations of a cluster and drop the lines inside it, so a level is scored on what that throws away:
+#
+#   demand_heterogeneity        share of the spatial demand variance (per time step) that is within clusters
+#   availability_heterogeneity  the same for the availability (per technology and time step)
+#   cut_capacity                capacity of the dropped lines inside the clusters, per direction
+#   peak_transfer               sum over the clusters of the peak transfer inside the cluster, half the absolute
+#                               deviation of the demand of its locations from the cluster mean
+#   transfer_shortfall          peak transfer not covered by the cut capacity, relative to the peak total demand
+#   {column}_dispersion         within cluster std of a generation column relative to its mean (per technology)
+#   score                       weighted sum of the relative measures above, see WEIGHTS
+#
+# All measures are 0 for the full model and grow as the clusters get coarser or less alike. The score only ranks
+# clusterings; fit_weights fits the weights on the objective gaps of solved runs to turn it into a gap estimate.
+#
+#   python scripts/reduction_error.py case_studies/8_locations
+
+WEIGHTS = {
+    'demand_heterogeneity': 1.0,
+    'availability_heterogeneity': 1.0,
+    'transfer_shortfall': 1.0,
+    **{f'{column}_dispersion': 0.25 for column in GENERATION_COLUMNS},
+}
+
+
+def factorize(*columns):
+    "code of every row in the combinations of columns, and the number of combinations"
+    codes, uniques = pd.MultiIndex.from_arrays(columns).factorize()
+    return codes, len(uniques)
+
+
+def within_squares(values, groups, size):
+    "sum of squared deviations from the group mean per group, count and mean per group"
+    count = np.bincount(groups, minlength=size)
+    mean = np.bincount(groups, weights=values, minlength=size) / np.maximum(count, 1)
+    # two passes, so equal values give exactly 0
+    return np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=size), count, mean
+
+
+def prepare_inputs(demand, availability, generation, lines):
+    """
+    the location codes and values of the input frames, shared by the scores of every tree
+
+    Locations are numbered in order of first appearance over demand, availability, generation and lines.
+    lines can be bidirectional or directional.
+    """
+    lines = to_directional(lines)
+    locations = pd.unique(pd.concat([
+        demand['location'], availability['location'], generation['location'], lines['from'], lines['to'],
+    ]).astype(str))
+    position = pd.Index(locations)
+
+    def codes(column):
+        return position.get_indexer(column.astype(str))
+
+    inputs = {'locations': locations}
+    inputs['demand'] = (codes(demand['location']), *factorize(demand['time_step']),
+                        demand['demand'].to_numpy(dtype=float))
+    inputs['availability'] = (codes(availability['location']),
+                              *factorize(availability['technology'], availability['time_step']),
+                              availability['availability'].to_numpy(dtype=float))
+    technology, technologies = factorize(generation['technology'])
+    inputs['generation'] = {column: (codes(generation['location']), technology, technologies,
+                                     generation[column].to_numpy(dtype=float)) for column in GENERATION_COLUMNS}
+    inputs['lines'] = codes(lines['from']), codes(lines['to']), lines['capacity'].to_numpy(dtype=float)
+    return inputs
+
+
+def heterogeneity(location, group, groups, values, labels, clusters):
+    "within cluster share of the variance of values per group, e.g. of the demand over the locations per time step"
+    if len(values) == 0:
+        return 0.0
+    total = within_squares(values, group, groups)[0].sum()
+    within = within_squares(values, labels[location] * groups + group, clusters * groups)[0].sum()
+    return within / total if total > 0 else 0.0
+
+
+def score_level(inputs, labels, clusters):
+    """
+    scores of one level of a tree
+
+    inputs:
+        inputs:     [dict]      see prepare_inputs
+        labels:     [array]     cluster (0..clusters-1) of every location of inputs
+        clusters:   [int]       number of clusters
+    """
+    scores = {'clusters': clusters}
+    location, time_step, time_steps, demand = inputs['demand']
+    scores['demand_heterogeneity'] = heterogeneity(location, time_step, time_steps, demand, labels, clusters)
+    scores['availability_heterogeneity'] = heterogeneity(*inputs['availability'], labels, clusters)
+
+    # transfer inside a cluster per time step: what the locations above the cluster mean have to receive
+    group = labels[location] * time_steps + time_step
+    mean = within_squares(demand, group, clusters * time_steps)[2]
+    transfer = 0.5 * np.bincount(group, weights=np.abs(demand - mean[group]), minlength=clusters * time_steps)
+    peak_transfer = transfer.reshape(clusters, time_steps).max(axis=1, initial=0)
+
+    start, end, capacity = inputs['lines']
+    inside = labels[start] == labels[end]
+    # the directional lines count both directions of a connection
+    cut_capacity = np.bincount(labels[start[inside]], weights=capacity[inside], minlength=clusters) / 2
+    peak_demand = np.bincount(time_step, weights=demand, minlength=time_steps).max(initial=0)
+    scores['cut_capacity'] = cut_capacity.sum()
+    scores['peak_transfer'] = peak_transfer.sum()
+    shortfall = np.maximum(peak_transfer - cut_capacity, 0).sum()
+    scores['transfer_shortfall'] = shortfall / peak_demand if peak_demand > 0 else 0.0
+
+    for column, (location, technology, technologies, values) in inputs['generation'].items():
+        within, count, _ = within_squares(values, labels[location] * technologies + technology, clusters * technologies)
+        scale = np.abs(values).mean() if len(values) else 0
+        dispersion = np.sqrt(within.sum() / count.sum()) / scale if scale > 0 else 0.0
+        scores[f'{column}_dispersion'] = dispersion
+
+    scores['score'] = sum(weight * scores[key] for key, weight in WEIGHTS.items())
+    return scores
+
+
+def score_index(inputs, index):
+    "scores of every level of a dendrogram index (see dendrogram_index.py), one row per level"
+    position = pd.Index(index['locations']).get_indexer(inputs['locations'])
+    missing = inputs['locations'][position < 0]
+    assert len(missing) == 0, f"locations {list(missing)[:5]} are not in the cluster tree"
+
+    rows = []
+    for level in range(1, get_levels(index) + 1):
+        labels = index['labels'][level - 1][position]
+        rows.append({'level': level, **score_level(inputs, labels, labels.max() + 1 if len(labels) else 0)})
+    return pd.DataFrame(rows)
+
+
+def load_inputs(folder):
+    "the inputs of the case study in folder, restricted to the time steps of its config"
+    case = CaseStudy(folder)
+    time_steps = case.sets_config['time_steps']
+    window = None if time_steps == 'auto' else (min(time_steps), max(time_steps))
+
+    def read(key, columns):
+        if not case.exists(key):
+            return pd.DataFrame(columns=columns)
+        df = case.read(key, time_steps=window if 'time_step' in columns else None)
+        if window is not None and 'time_step' in columns:
+            df = df[df['time_step'].isin(time_steps)]
+        return df
+
+    frames = (
+        read('demand', ['location', 'time_step', 'demand']),
+        read('generation_availability', ['location', 'technology', 'time_step', 'availability']),
+        read('generation', ['technology', 'location', *GENERATION_COLUMNS]),
+        case.lines,
+    )
+    return case, frames, prepare_inputs(*frames)
+
+
+def score_case_study(folder, trees=None, group_sizes=()):
+    """
+    scores every level of candidate cluster trees of the case study in folder, reading its inputs once
+
+    inputs:
+        folder:         [string]    case study folder with a config.toml
+        trees:          [dict]      name -> nested clusters list, default the clusters of the config.toml
+        group_sizes:    [list]      also score the trees of clustering.create_clusters with these group sizes,
+                                    named group_{size}; group size 2 when there are no other trees
+    returns one row per tree and level, in the order of the trees
+    """
+    case, (demand, availability, _, lines), inputs = load_inputs(folder)
+    trees = dict(trees if trees is not None else {'config': case.clusters} if case.clusters else {})
+    if not trees and not group_sizes:
+        group_sizes = [2]
+    if group_sizes:
+        graph = graph_from_lines(lines)
+        graph.add_nodes_from(inputs['locations'])
+        for size in group_sizes:
+            trees[f'group_{size}'] = create_clusters(graph, demand=demand, availability=availability, group_size=size)
+    frames = [score_index(inputs, build_dendrogram_index(tree)).assign(tree=name) for name, tree in trees.items()]
+    scores = pd.concat(frames, ignore_index=True)
+    return scores[['tree', *scores.columns[:-1]]]
+
+
+def fit_weights(scores, gaps):
+    """
+    least squares weights of the score measures that predict the relative objective gap of solved reductions
+
+    inputs:
+        scores: [DataFrame]     rows of score_case_study of the solved levels
+        gaps:   [array]         (reduced - full objective) / full objective of every row
+    returns a dict like WEIGHTS, which score_level uses after WEIGHTS.update
+    """
+    keys = list(WEIGHTS)
+    weights = np.linalg.lstsq(scores[keys].to_numpy(dtype=float), np.asarray(gaps, dtype=float), rcond=None)[0]
+    return dict(zip(keys, weights))
+
+
+if __name__ == '__main__':
+    with pd.option_context('display.max_columns', None, 'display.width', None):
+        for folder in sys.argv[1:] or ['case_studies/8_locations']:
+            print(score_case_study(folder))
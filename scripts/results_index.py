@@ -0,0 +1,141 @@
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Persistent index of the results.csv files that main.jl writes to results/{timestamp}-{experiment}/.
+# Files are keyed by path and modification time, so collect() only reads runs that are new or changed.
+# Older results.csv files only have run, reduction, objective and runtime: their time steps are taken from the
+# folder name ({timestamp}-{time_steps}_steps) and their n and bound_alpha_factor are stored as NULL.
+
+RESULT_COLUMNS = ['run', 'reduction', 'objective', 'runtime', 'n', 'time_steps', 'bound_alpha_factor']
+GROUP_COLUMNS = ('reduction', 'n', 'time_steps', 'bound_alpha_factor')
+
+
+def connect(root='./results', database=None):
+    "opens (and creates) the index database, by default results_index.sqlite in the results folder"
+    if database is None:
+        database = os.path.join(root, 'results_index.sqlite')
+    connection = sqlite3.connect(database)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            experiment TEXT,
+            mtime REAL
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            path TEXT REFERENCES files(path),
+            experiment TEXT,
+            run INTEGER,
+            reduction INTEGER,
+            objective REAL,
+            runtime REAL,
+            n INTEGER,
+            time_steps INTEGER,
+            bound_alpha_factor REAL
+        );
+        CREATE INDEX IF NOT EXISTS results_path ON results(path);
+    """)
+    return connection
+
+
+def collect(root='./results', database=None):
+    """
+    ingests every results.csv under root (recursively) that is not indexed yet or changed since it was indexed,
+    and drops the runs whose folder was removed. The experiment of a run is its folder relative to root.
+
+    returns the open connection and the number of ingested files
+    """
+    connection = connect(root, database)
+    indexed = dict(connection.execute("SELECT path, mtime FROM files"))
+
+    found = set()
+    ingested = 0
+    for directory, _, files in os.walk(root):
+        if 'results.csv' not in files:
+            continue
+        path = os.path.join(directory, 'results.csv')
+        found.add(path)
+        mtime = os.stat(path).st_mtime
+        if indexed.get(path) == mtime:
+            continue
+
+        experiment = os.path.relpath(directory, root)
+        df = pd.read_csv(path)
+        if 'time_steps' not in df:
+            match = re.search(r'-(\d+)_steps', directory)
+            df['time_steps'] = int(match.group(1)) if match else None
+        df = df.reindex(columns=RESULT_COLUMNS).astype(object)
+        df = df.where(df.notna(), None)
+        df['reduction'] = df['reduction'].astype(str).str.lower().eq('true').astype(int)
+        df.insert(0, 'experiment', experiment)
+        df.insert(0, 'path', path)
+        with connection:
+            connection.execute("DELETE FROM results WHERE path = ?", (path,))
+            connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, experiment, mtime))
+            connection.executemany(
+                f"INSERT INTO results VALUES ({', '.join('?' * len(df.columns))})",
+                df.itertuples(index=False, name=None),
+            )
+        ingested += 1
+
+    with connection:
+        for path in set(indexed) - found:
+            connection.execute("DELETE FROM results WHERE path = ?", (path,))
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+    return connection, ingested
+
+
+def runs(connection, experiment=None):
+    "all indexed runs, optionally only of the experiments matching a GLOB pattern"
+    where = "WHERE experiment GLOB ?" if experiment is not None else ""
+    df = pd.read_sql_query(
+        f"SELECT experiment, {', '.join(RESULT_COLUMNS)} FROM results {where}",
+        connection,
+        params=() if experiment is None else (experiment,),
+    )
+    df['reduction'] = df['reduction'].astype(bool)
+    return df
+
+
+def summary(connection, by=GROUP_COLUMNS, experiment=None):
+    """
+    mean, std and min of the objective and the runtime per group
+
+    inputs:
+        connection: [sqlite3.Connection]    see collect
+        by:         [tuple of string]       columns to group by, any of the results.csv columns and 'experiment'
+        experiment: [string]                optional GLOB pattern on the experiment folder name, e.g. '*_steps'
+    """
+    by = list(by)
+    assert set(by) <= set(RESULT_COLUMNS) | {'experiment'}
+    aggregates = ', '.join(
+        f"AVG({column}) AS {column}_mean, MIN({column}) AS {column}_min, "
+        f"SUM({column} * {column}) AS {column}_squares, SUM({column}) AS {column}_sum"
+        for column in ('objective', 'runtime')
+    )
+    where = "WHERE experiment GLOB ?" if experiment is not None else ""
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(by)}, COUNT(*) AS runs, {aggregates} FROM results {where} "
+        f"GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}",
+        connection,
+        params=() if experiment is None else (experiment,),
+    )
+
+    # sample standard deviation from the sums, as SQLite has no STDEV
+    for column in ('objective', 'runtime'):
+        squares = df.pop(f'{column}_squares')
+        total = df.pop(f'{column}_sum')
+        variance = (squares - total ** 2 / df['runs']) / (df['runs'] - 1)
+        df[f'{column}_std'] = np.sqrt(variance.clip(lower=0)).where(df['runs'] > 1)
+    if 'reduction' in df:
+        df['reduction'] = df['reduction'].astype(bool)
+    return df
+
+
+if __name__ == '__main__':
+    connection, ingested = collect()
+    print(f'ingested {ingested} new results')
+    print(summary(connection))
@@ -1,15 +1,14 @@
-# Load the CSV file into a DataFrame
-import pandas as pd
+from case_study import CaseStudy
+from profiles import build_profile_library, write_sun_distribution
 
+# Builds the profile library (profile_library.npz, month x hour statistics of every variable technology) in one pass
+# over the availability of a case study, and the hour of day SunPV statistics of sun_distribution.csv from it.
 
-df = pd.read_csv('case_studies/stylized_EU/inputs/generation_availability.csv')
 
-df = df[df['technology'] == 'SunPV']
+def build(folder='case_studies/stylized_EU', per_location=False):
+    library = build_profile_library(CaseStudy(folder).path('generation_availability'), per_location=per_location)
+    print(f"profile library written to {library}, SunPV statistics by hour to {write_sun_distribution(library)}")
 
-df["hour"] = df['time_step'] % 24
 
-# Group by technology and calculate statistics for availability
-stats = df.groupby('hour')['availability'].agg(['mean', 'std'])
-
-print("Statistics for availability by technology:")
-stats.to_csv("sun_distribution.csv")
\ No newline at end of file
+if __name__ == '__main__':
+    build()
@@ -1,61 +1,106 @@
 
+from itertools import chain
+
 import numpy as np
 import pandas as pd
 
-
-
-def add_generation_and_generation_availability(n, name, time_steps):
+from columnar import DEFAULT_AVAILABILITY, FILE_NAMES, write_dense, write_table
+from correlated_availability import ar1
+from csv_writer import DEFAULT_CHUNK_SIZE, output_path, write_frames, write_rows
+from profiles import get_profile
+from profiling import stage
+
+# (technology, mean availability, std availability), which locations have the technology is decided by the
+# probability in GENERATION_TECHNOLOGIES
+AVAILABILITY_TECHNOLOGIES = [
+    ('WindOff', 0.5, 0.27),
+    ('WindOn', 0.3, 0.2),
+    ('SunPV', 0.3, 0.2),
+]
+
+# (technology, yearly investment cost, (variable_cost, unit_capacity, ramping_rate), probability that a location has the technology)
+GENERATION_TECHNOLOGIES = [
+    ("Coal", 33.75, (0.15, 400, 0.4), 4/20),
+    ("Gas", 23.33333333, (0.05, 250, 0.75), 19/20),
+    ("Lignite", 38.75, (0.1, 400, 0.5), 19/20),
+    ("Nuclear", 68.66666667, (0.01, 1000, 0.2), 9/20),
+    ("Oil", 24.16666667, (0.2, 100, 0.9), 10/20),
+    ("SunPV", 24, (1.00E-04, 50, 1.0), 20/20),
+    ("WindOff", 88.33333333, (0.005, 100, 1.0), 16/20),
+    ("WindOn", 48.4, (0.0025, 100, 1.0), 20/20),
+]
+
+TECHNOLOGIES = [tech for tech, _, _, _ in GENERATION_TECHNOLOGIES]
+
+
+def add_generation_and_generation_availability(n, name, time_steps, output_format='csv', technologies=None,
+                                               correlation_factor=None, autocorrelation=0.9, compress=False):
     """
     generates the generation_availability.csv and the generation.csv in file location: case_studies/{name}/inputs
 
+    Which locations have a technology is drawn once and shared by both files, availability rows are only written
+    for generators that exist. The model uses an availability of 1.0 for every (location, technology, time_step)
+    without a row (DEFAULT_AVAILABILITY, also the fill value of the dense columnar array).
+
     inputs:
         n:      [int]       number of nodes
         name:   [string]    name of the case study (also the place where data is stored)
         time_steps [int]    number of hours
+        output_format [string] 'csv' or 'columnar' (dense .npy availability and a feather generation table, see columnar.py)
+        technologies [list] technology mix to generate, a subset of TECHNOLOGIES (default all)
+        correlation_factor [array] optional (n x rank) factor of the spatial correlation (see correlated_availability.py),
+                            the availability is then correlated between locations and in time instead of independent
+        autocorrelation [float] lag one autocorrelation of the availability noise, only used with a correlation_factor
+        compress [bool]     gzip the csv files
     """
     
     folder = f'case_studies/{name}'
     input_folder = f'{folder}/inputs'
+    files = FILE_NAMES[output_format]
 
-    # Generation availability
-    generation_av = ["location,technology,time_step,availability"]
-    
-    technologies = [
-        ('WindOff', 0.5, 0.27, 16/20),
-        ('WindOn', 0.3, 0.2, 1),
-        ('SunPV', 0.3, 0.2, 1),
-    ]
-
-    df_sun_distributions = pd.read_csv('sun_distribution.csv')
-
-    for tech, mean, std, p in technologies:
-        add_gen_av(n, time_steps, generation_av, mean, std, tech, p, df_sun_distributions)
+    if technologies is None:
+        technologies = TECHNOLOGIES
+    assert set(technologies) <= set(TECHNOLOGIES), f"unknown technologies {set(technologies) - set(TECHNOLOGIES)}"
+    generation_technologies = [t for t in GENERATION_TECHNOLOGIES if t[0] in technologies]
+    availability_technologies = [t for t in AVAILABILITY_TECHNOLOGIES if t[0] in technologies]
 
+    # one ownership mask per technology: which locations have it
+    ownership = {tech: get_list_technologies_distribution(n, p) for tech, _, _, p in generation_technologies}
 
-    with open(f'{input_folder}/generation_availability.csv', 'w+') as f:
-        f.write('\n'.join(generation_av) + '\n')
+    # Generation availability
+    with stage('availability', folder, output_path(f'{input_folder}/{files["generation_availability"]}', compress)):
+        if correlation_factor is None:
+            generation_av = chain.from_iterable(
+                add_gen_av(time_steps, mean, std, tech, ownership[tech])
+                for tech, mean, std in availability_technologies
+            )
+        else:
+            generation_av = chain.from_iterable(
+                add_correlated_gen_av(time_steps, mean, std, tech, ownership[tech], correlation_factor, autocorrelation)
+                for tech, mean, std in availability_technologies
+            )
+        if output_format == 'csv':
+            write_frames(f'{input_folder}/{files["generation_availability"]}',
+                         ["location", "technology", "time_step", "availability"], generation_av, compress)
+        else:
+            write_dense(f'{input_folder}/{files["generation_availability"]}', generation_av,
+                        ["location", "technology", "time_step"], "availability",
+                        [[f"l{i}" for i in range(n)], [t for t, _, _, _ in generation_technologies],
+                         list(range(1, time_steps + 1))], fill=DEFAULT_AVAILABILITY)
 
 
     # Generation
-    generation = ["technology,location,investment_cost,variable_cost,unit_capacity,ramping_rate"]
-    investment_factor = time_steps / 8760
-    technologies = [
-        ("Coal", f"{investment_factor * 33.75},0.15,400,0.4", 4/20),
-        ("Gas", f"{investment_factor * 23.33333333},0.05,250,0.75", 19/20),
-        ("Lignite", f"{investment_factor * 38.75},0.1,400,0.5", 19/20),
-        ("Nuclear", f"{investment_factor * 68.66666667},0.01,1000,0.2", 9/20),
-        ("Oil", f"{investment_factor * 24.16666667},0.2,100,0.9", 10/20),
-        ("SunPV", f"{investment_factor * 24},1.00E-04,50,1.0", 20/20),
-        ("WindOff", f"{investment_factor * 88.33333333},0.005,100,1.0", 16/20),
-        ("WindOn", f"{investment_factor * 48.4},0.0025,100,1.0", 20/20),
-    ]
-    for name, costs, p in technologies:
-        add_technoligy(name, n, generation, costs, p)
-
-    
-
-    with open(f'{input_folder}/generation.csv', 'w+') as f:
-        f.write('\n'.join(generation) + '\n')
+    with stage('generation', folder, output_path(f'{input_folder}/{files["generation"]}', compress)):
+        investment_factor = time_steps / 8760
+        generation = chain.from_iterable(
+            add_technoligy(tech, (investment_factor * investment_cost, *costs), ownership[tech])
+            for tech, investment_cost, costs, _ in generation_technologies
+        )
+        header = ["technology", "location", "investment_cost", "variable_cost", "unit_capacity", "ramping_rate"]
+        if output_format == 'csv':
+            write_rows(f'{input_folder}/{files["generation"]}', header, generation, compress=compress)
+        else:
+            write_table(f'{input_folder}/{files["generation"]}', header, generation)
 
 
 def get_list_technologies_distribution(n, p):
@@ -63,23 +108,69 @@ def get_list_technologies_distribution(n, p):
     return np.random.binomial(1, p, size=n)
 
 
-def add_gen_av(n, time_steps, generation_av, mean, std, tech, p, df):
+def add_gen_av(time_steps, mean, std, tech, owned, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    draws the availability of one technology at the locations that have it (owned, one 0/1 per location)
+    in blocks of locations and yields each block as a long-format DataFrame (location, technology, time_step, availability)
+
+    A block holds about chunk_size rows, so memory stays bounded for any number of locations.
+    The normal draws are taken in (location, time_step) order, like the original per-row loop.
+    """
+    steps = np.arange(1, time_steps + 1)
+    block = max(1, chunk_size // time_steps)
+    loc, scale = get_availability_distribution(time_steps, mean, std, tech)
+    owned = np.flatnonzero(owned)
 
-    prob = get_list_technologies_distribution(n, p)
-    for i in range(n):
-        for time_step in range(1, time_steps + 1):
-            if prob[i]:
-                if tech == 'SunPV':
-                    mean = df.iloc[[time_step % 24]]["mean"].item()
-                    std = df.iloc[[time_step % 24]]["std"].item()
-                synthetic_availability = round(min(1, max(0, np.random.normal(loc=mean, scale=std))), 4)
-            else:
-                synthetic_availability = 0
-            generation_av.append(f"l{i},{tech},{time_step},{synthetic_availability}")
+    for start in range(0, len(owned), block):
+        locations = owned[start:start + block]
+        availability = np.round(np.clip(
+            np.random.normal(loc=loc, scale=scale, size=(len(locations), time_steps)), 0, 1), 4)
 
+        yield pd.DataFrame({
+            "location": np.repeat([f"l{i}" for i in locations], time_steps),
+            "technology": tech,
+            "time_step": np.tile(steps, len(locations)),
+            "availability": availability.ravel(),
+        })
 
-def add_technoligy(name, n, generation, costs, p):
-    prob = get_list_technologies_distribution(n, p)
-    for location in range(n):
-        if prob[location]:
-            generation.append(f"{name},l{location},{costs}")
+
+def get_availability_distribution(time_steps, mean, std, tech):
+    """
+    mean and std of the availability per time step: the seasonal profile of tech in the profile library
+    (see profiles.py) if there is one, otherwise the constant mean and std
+    """
+    profile = get_profile(tech, np.arange(1, time_steps + 1))
+    if profile is not None:
+        return profile
+    return np.full(time_steps, mean), np.full(time_steps, std)
+
+
+def add_correlated_gen_av(time_steps, mean, std, tech, owned, factor, autocorrelation, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    like add_gen_av, but the noise is the spatially and temporally correlated field of correlated_availability.py
+
+    The AR(1) processes behind the field are drawn once for the whole horizon, every block of locations is then
+    a single matrix product with its rows of factor.
+    """
+    steps = np.arange(1, time_steps + 1)
+    block = max(1, chunk_size // time_steps)
+    loc, scale = get_availability_distribution(time_steps, mean, std, tech)
+    processes = ar1(np.random.standard_normal((factor.shape[1], time_steps)), autocorrelation)
+    owned = np.flatnonzero(owned)
+
+    for start in range(0, len(owned), block):
+        locations = owned[start:start + block]
+        availability = np.round(np.clip(loc + scale * (factor[locations] @ processes), 0, 1), 4)
+
+        yield pd.DataFrame({
+            "location": np.repeat([f"l{i}" for i in locations], time_steps),
+            "technology": tech,
+            "time_step": np.tile(steps, len(locations)),
+            "availability": availability.ravel(),
+        })
+
+
+def add_technoligy(name, costs, owned):
+    "yields a generation row for every location that has technology name (owned, one 0/1 per location)"
+    for location in np.flatnonzero(owned):
+        yield (name, f"l{location}", *costs)
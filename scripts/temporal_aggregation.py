@@ -0,0 +1,232 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import toml
+
+from case_study import CaseStudy
+
+# Temporal counterpart of reduction.py: the horizon of a case study is cut into periods (days or weeks) and k
+# representative periods are picked by k-medoids on the joint demand and availability profiles of all locations.
+# The reduced case study only holds the representative periods, numbered 1..k*period_length in chronological order.
+#
+# These are unweighted representative periods: run_optimisation weighs every time step equally and its inputs have
+# no time dependent costs to carry a weight, so every representative counts once in the operational costs, however
+# many periods it stands for. The investment costs are only scaled to the shorter horizon by k*period_length/T, the
+# same way the generators scale them with time_steps / 8760. The number of periods every representative stands for
+# is written to periods.csv for the analysis, the model does not read it. time_step_mapping.csv maps every original
+# time step to the time step that represents it, reconstruct_outputs uses it to expand the outputs of a reduced run
+# back to the full horizon.
+
+PERIODS = 'periods.csv'
+MAPPING = 'time_step_mapping.csv'
+TIME_OUTPUTS = ('production', 'line_flow', 'loss_of_load')
+
+
+def get_period_profiles(demand, availability, time_steps, period_length):
+    """
+    one feature row per period: the demand of every location (scaled by its peak) and the availability of every
+    generator over the time steps of the period
+
+    The last period is padded with its last time step when the horizon is not a multiple of period_length.
+    """
+    profiles = demand.pivot_table(index='location', columns='time_step', values='demand').reindex(columns=time_steps)
+    peak = profiles.abs().max(axis=1).replace(0, 1)
+    rows = [profiles.div(peak, axis=0).to_numpy()]
+    if len(availability):
+        rows.append(availability.pivot_table(index=['location', 'technology'], columns='time_step',
+                                             values='availability').reindex(columns=time_steps).to_numpy())
+    rows = np.nan_to_num(np.vstack(rows))
+
+    n_periods = -(-len(time_steps) // period_length)
+    rows = np.pad(rows, ((0, 0), (0, n_periods * period_length - len(time_steps))), mode='edge')
+    return rows.reshape(len(rows), n_periods, period_length).transpose(1, 0, 2).reshape(n_periods, -1)
+
+
+def kmedoids(features, k, candidates=None, seed=0, restarts=10, max_iterations=100):
+    """
+    k-medoids by alternating assignment and medoid update, both as whole matrix operations on the distances
+
+    The alternation converges fast but only to a local optimum, so it is followed by PAM swaps (replace the medoid
+    and candidate pair that lowers the total distance most, until no swap does) and restarted from several
+    k-means++ initialisations, keeping the medoids with the lowest total distance.
+
+    inputs:
+        features:   [array]     one row per period
+        k:          [int]       number of medoids
+        candidates: [bool array] periods that may become a medoid, default all
+    returns the medoid periods and the medoid index of every period
+    """
+    n = len(features)
+    if candidates is None:
+        candidates = np.ones(n, dtype=bool)
+    squares = np.sum(features ** 2, axis=1)
+    distances = np.maximum(squares[:, None] + squares[None, :] - 2 * features @ features.T, 0)
+
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(restarts):
+        medoids, assignment = _alternate(distances, k, candidates, rng, max_iterations)
+        cost = distances[np.arange(n), medoids[assignment]].sum()
+        if best is None or cost < best[0]:
+            best = cost, medoids, assignment
+    return best[1], best[2]
+
+
+def _alternate(distances, k, candidates, rng, max_iterations):
+    n = len(distances)
+    # k-means++ initialisation on the candidates
+    medoids = [rng.choice(np.flatnonzero(candidates))]
+    for _ in range(1, k):
+        weight = np.where(candidates, distances[:, medoids].min(axis=1), 0)
+        if weight.sum() == 0:
+            weight = (candidates & ~np.isin(np.arange(n), medoids)).astype(float)
+        medoids.append(rng.choice(n, p=weight / weight.sum()))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iterations):
+        assignment = np.argmin(distances[:, medoids], axis=1)
+        assignment[medoids] = np.arange(k)
+        # cost of every candidate as medoid of every cluster: the summed distance to the members of that cluster
+        members = np.zeros((k, n))
+        members[assignment, np.arange(n)] = 1
+        cost = members @ distances
+        cost[~((assignment[None, :] == np.arange(k)[:, None]) & candidates[None, :])] = np.inf
+        new_medoids = np.argmin(cost, axis=1)
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+
+    while True:
+        # without medoid i every period falls back to its nearest or, if i was its nearest, second nearest medoid
+        nearest = np.sort(distances[:, medoids], axis=1)[:, :2] if k > 1 else np.full((n, 2), np.inf)
+        closest = np.argmin(distances[:, medoids], axis=1)
+        fallback = np.where(closest[None, :] == np.arange(k)[:, None], nearest[:, 1][None, :], nearest[:, 0][None, :])
+        # total distance after swapping medoid i for period h, for all pairs at once
+        swap_cost = np.minimum(fallback[:, None, :], distances.T[None, :, :]).sum(axis=2)
+        swap_cost[:, ~candidates] = np.inf
+        swap_cost[:, medoids] = np.inf
+        i, h = np.unravel_index(np.argmin(swap_cost), swap_cost.shape)
+        if swap_cost[i, h] >= distances[np.arange(n), medoids[closest]].sum() - 1e-12:
+            break
+        medoids = medoids.copy()
+        medoids[i] = h
+
+    assignment = np.argmin(distances[:, medoids], axis=1)
+    assignment[medoids] = np.arange(k)
+    return medoids, assignment
+
+
+def aggregate_case_study(folder, k, period_length=24, output_folder=None, seed=0):
+    """
+    writes a case study with only k unweighted representative periods of the case study in folder
+
+    inputs:
+        folder:         [string]    case study folder with a config.toml
+        k:              [int]       number of representative periods
+        period_length:  [int]       time steps per period, 24 for days and 168 for weeks
+        output_folder:  [string]    default {folder}/aggregated/{k}x{period_length}
+    returns the path of the written config.toml
+    """
+    if output_folder is None:
+        output_folder = os.path.join(folder, 'aggregated', f'{k}x{period_length}')
+
+    case = CaseStudy(folder)
+    config, data_config = case.config, case.data_config
+
+    demand = case.demand
+    availability = case.availability
+    generation = case.generation
+
+    time_steps = np.union1d(demand['time_step'].unique(), availability['time_step'].unique())
+    n_periods = -(-len(time_steps) // period_length)
+    assert 0 < k <= len(time_steps) // period_length, \
+        f"{k} representative periods of {period_length} time steps do not fit in {len(time_steps)} time steps"
+
+    # only complete periods can represent others, a padded last period is still assigned to one
+    candidates = np.arange(n_periods) < len(time_steps) // period_length
+    features = get_period_profiles(demand, availability, time_steps, period_length)
+    medoids, assignment = kmedoids(features, k, candidates, seed)
+
+    # number the representatives chronologically
+    order = np.argsort(medoids)
+    medoids = medoids[order]
+    rank = np.empty(k, dtype=int)
+    rank[order] = np.arange(k)
+    assignment = rank[assignment]
+
+    # time step i of the horizon lies in period i // period_length at offset i % period_length
+    position = np.arange(len(time_steps))
+    representative_time_step = assignment[position // period_length] * period_length + position % period_length + 1
+    period_sizes = np.bincount(position // period_length, minlength=n_periods)
+    weights = np.bincount(assignment, weights=period_sizes / period_length, minlength=k)
+
+    new_time_step = pd.Series(
+        np.arange(k * period_length) + 1,
+        index=time_steps[(medoids[:, None] * period_length + np.arange(period_length)).ravel()],
+    )
+
+    def select(frame):
+        frame = frame[frame['time_step'].isin(new_time_step.index)]
+        return frame.assign(time_step=new_time_step.loc[frame['time_step']].to_numpy())
+
+    output_input_folder = os.path.join(output_folder, data_config['dir'])
+    os.makedirs(output_input_folder, exist_ok=True)
+    select(demand).to_csv(os.path.join(output_input_folder, data_config['demand']), index=False)
+    select(availability).to_csv(os.path.join(output_input_folder, data_config['generation_availability']), index=False)
+    generation.assign(investment_cost=generation['investment_cost'] * k * period_length / len(time_steps)).to_csv(
+        os.path.join(output_input_folder, data_config['generation']), index=False)
+    for key in ('transmission_lines', 'scalars'):
+        shutil.copy(case.path(key), os.path.join(output_input_folder, data_config[key]))
+
+    pd.DataFrame({
+        'representative': np.arange(k) + 1,
+        'period': medoids,
+        'first_time_step': time_steps[medoids * period_length],
+        'weight': weights,
+    }).to_csv(os.path.join(output_folder, PERIODS), index=False)
+    pd.DataFrame({
+        'time_step': time_steps,
+        'representative_time_step': representative_time_step,
+    }).to_csv(os.path.join(output_folder, MAPPING), index=False)
+
+    config['input']['sets']['time_steps'] = list(range(1, k * period_length + 1))
+    config_path = os.path.join(output_folder, 'config.toml')
+    with open(config_path, 'w') as f:
+        toml.dump(config, f)
+    print(f'{len(time_steps)} time steps reduced to {k} unweighted periods of {period_length}, written to {output_folder}')
+    return config_path
+
+
+def reconstruct_outputs(folder, output_folder=None):
+    """
+    expands the time dependent outputs (production, line flow, loss of load) of a run on an aggregated case study
+    to the time steps of the original horizon, using its time_step_mapping.csv
+
+    inputs:
+        folder:         [string]    aggregated case study folder, see aggregate_case_study
+        output_folder:  [string]    where the expanded outputs are written, default {output dir}/full_horizon
+    """
+    config = toml.load(os.path.join(folder, 'config.toml'))
+    output_config = config['output']
+    output_dir = os.path.join(folder, output_config['dir'])
+    if output_folder is None:
+        output_folder = os.path.join(output_dir, 'full_horizon')
+    os.makedirs(output_folder, exist_ok=True)
+
+    mapping = pd.read_csv(os.path.join(folder, MAPPING))
+    for key in TIME_OUTPUTS:
+        output = pd.read_csv(os.path.join(output_dir, output_config[key]))
+        expanded = mapping.merge(output.rename(columns={'time_step': 'representative_time_step'}),
+                                 on='representative_time_step').drop(columns='representative_time_step')
+        columns = [column for column in output.columns if column != 'time_step']
+        expanded = expanded[[*columns[:-1], 'time_step', columns[-1]]].sort_values([*columns[:-1], 'time_step'])
+        expanded.to_csv(os.path.join(output_folder, output_config[key]), index=False)
+    shutil.copy(os.path.join(output_dir, output_config['investment']), os.path.join(output_folder, output_config['investment']))
+    return output_folder
+
+
+if __name__ == '__main__':
+    # 4 representative days of the hourly year of the 2 location case study
+    aggregate_case_study('case_studies/2_locations', k=4)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import each other as flat modules, like when they are run from scripts/ or with python -m scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,17 @@
+import os
+
+# results.csv files in the format of the older main.jl, with only run, reduction, objective and runtime,
+# in nested results/{grid}/{timestamp}-{time_steps}_steps/ folders like results_grid_3000.zip
+
+
+def write_old_results(root, time_steps=(100, 300), runs=3):
+    "writes one old format results.csv per number of time steps under root/grid and returns root"
+    for steps in time_steps:
+        folder = os.path.join(root, 'grid', f'2024-06-01T12-00-{steps:03d}-{steps}_steps')
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'results.csv'), 'w') as f:
+            f.write('run,reduction,objective,runtime\n')
+            for run in range(1, runs + 1):
+                f.write(f'{run},false,{1000.0 * steps + run},{0.01 * steps + 0.1 * run}\n')
+                f.write(f'{run},true,{1010.0 * steps + run},{0.002 * steps + 0.1 * run}\n')
+    return root
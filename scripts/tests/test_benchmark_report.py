@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmark_report import compare_instances, write_report
+from old_results import write_old_results
+from results_index import collect, runs
+
+
+def write_new_results(root, n, time_steps, runs=3):
+    folder = os.path.join(root, f'2025-01-01T00-00-00-{n}_locations_{time_steps}_steps')
+    os.makedirs(folder)
+    pd.DataFrame({
+        'run': [run for run in range(1, runs + 1) for _ in range(2)],
+        'reduction': [False, True] * runs,
+        'objective': [100.0 * n, 101.0 * n] * runs,
+        'runtime': [0.01 * n * time_steps, 0.002 * n * time_steps] * runs,
+        'n': n, 'time_steps': time_steps, 'bound_alpha_factor': 1.5,
+    }).to_csv(os.path.join(folder, 'results.csv'), index=False)
+
+
+def test_old_results_are_skipped(tmp_path, capsys):
+    root = write_old_results(str(tmp_path))
+    connection, _ = collect(root)
+    comparison = compare_instances(runs(connection), samples=100)
+    assert comparison.empty
+    assert 'skipping 2 experiments without n or time_steps' in capsys.readouterr().out
+
+    with pytest.raises(AssertionError, match='no instance with n and time_steps'):
+        write_report(root, samples=100)
+
+
+def test_report_with_old_and_new_results(tmp_path, capsys):
+    root = write_old_results(str(tmp_path))
+    for n, time_steps in ((8, 100), (16, 100), (16, 200)):
+        write_new_results(root, n, time_steps)
+    comparison, fits = write_report(root, samples=100)
+
+    assert 'skipping 2 experiments' in capsys.readouterr().out
+    assert sorted(zip(comparison['n'], comparison['time_steps'])) == [(8, 100), (16, 100), (16, 200)]
+    assert comparison['speedup'].tolist() == pytest.approx([5.0] * 3)
+    assert comparison['objective_gap'].tolist() == pytest.approx([0.01] * 3)
+    assert fits['Full']['n_exponent'] == pytest.approx(1.0)
+    for name in ('comparison.csv', 'report.html', 'speedup.png', 'objective_gap.png', 'scaling.png'):
+        assert os.path.exists(os.path.join(root, 'report', name))
@@ -0,0 +1,32 @@
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+
+from cli import main
+from old_results import write_old_results
+
+
+@pytest.fixture
+def results(tmp_path):
+    return write_old_results(str(tmp_path))
+
+
+def test_stats(results, capsys):
+    main(['stats', '--results', results])
+    out = capsys.readouterr().out
+    assert 'ingested 2 new results' in out
+    assert 'objective_mean' in out
+
+    main(['stats', '--results', results, '--by', 'reduction', 'time_steps', '--experiment', '*_steps'])
+    assert 'ingested 0 new results' in capsys.readouterr().out
+
+
+@pytest.mark.filterwarnings('ignore:FigureCanvasAgg is non-interactive')
+def test_plot(results):
+    main(['plot', '--results', results])
+
+
+def test_plot_report(results, capsys):
+    with pytest.raises(AssertionError, match='no instance with n and time_steps'):
+        main(['plot', '--results', results, '--report'])
+    assert 'skipping 2 experiments' in capsys.readouterr().out
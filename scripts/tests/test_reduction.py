@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dendrogram_index import build_dendrogram_index
+from reduction import GENERATION_COLUMNS, reduce_case_study, reduce_frames
+
+# unequal clusters: a_b_c and d merge into a_b_c_d, e and f into e_f
+TREE = [[['a', 'b', 'c'], ['d']], [['e'], ['f']]]
+LOCATIONS = ['a', 'b', 'c', 'd', 'e', 'f']
+VALUES = [0.0, 0.0, 0.0, 1.0, 0.2, 0.4]
+
+
+def reduce(weighted):
+    demand = pd.DataFrame({'location': LOCATIONS, 'time_step': 1, 'demand': [1.0, 2, 3, 4, 5, 6]})
+    availability = pd.DataFrame({'location': LOCATIONS, 'technology': 'SunPV', 'time_step': 1, 'availability': VALUES})
+    generation = pd.DataFrame({'technology': 'SunPV', 'location': LOCATIONS,
+                               **{column: [10 * value for value in VALUES] for column in GENERATION_COLUMNS}})
+    lines = pd.DataFrame({'from': ['a', 'd', 'd', 'f'], 'to': ['d', 'a', 'e', 'd'], 'capacity': [1.0, 1, 2, 3]})
+    levels = reduce_frames(demand, availability, generation, lines, build_dendrogram_index(TREE), weighted)
+    return [tables for _, _, tables in levels]
+
+
+@pytest.mark.parametrize('weighted, expected', [(False, 0.5), (True, 0.25)])
+def test_reduce_frames_means(weighted, expected):
+    (demand, availability, generation, lines), (demand_2, availability_2, generation_2, lines_2) = reduce(weighted)
+
+    # level 1 is the same either way
+    assert availability.set_index('location')['availability'].to_dict() == {'a_b_c': 0.0, 'd': 1.0, 'e': 0.2, 'f': 0.4}
+    assert demand.set_index('location')['demand'].to_dict() == {'a_b_c': 6.0, 'd': 4.0, 'e': 5.0, 'f': 6.0}
+    assert lines[['from', 'to', 'capacity']].values.tolist() == [['a_b_c', 'd', 1.0], ['d', 'a_b_c', 1.0],
+                                                                 ['d', 'e', 2.0], ['f', 'd', 3.0]]
+
+    # level 2: mean of the cluster means, or the mean over the original locations
+    assert availability_2.set_index('location')['availability'].to_dict() == pytest.approx(
+        {'a_b_c_d': expected, 'e_f': 0.3})
+    for column in GENERATION_COLUMNS:
+        assert generation_2.set_index('location')[column].to_dict() == pytest.approx(
+            {'a_b_c_d': 10 * expected, 'e_f': 3.0})
+    assert demand_2.set_index('location')['demand'].to_dict() == {'a_b_c_d': 10.0, 'e_f': 11.0}
+    assert lines_2[['from', 'to', 'capacity']].values.tolist() == [['a_b_c_d', 'e_f', 2.0], ['e_f', 'a_b_c_d', 3.0]]
+
+
+def test_reduce_case_study_without_clusters(tmp_path):
+    folder = os.path.join(os.path.dirname(__file__), '..', '..', 'case_studies', '8_locations')
+    output_folder = os.path.join(tmp_path, 'reduced')
+    with pytest.raises(AssertionError, match='has no clusters; nothing to reduce'):
+        reduce_case_study(folder, output_folder)
+    assert not os.path.exists(output_folder)
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+from old_results import write_old_results
+from results_index import collect, runs, summary
+
+
+def test_collect_old_format(tmp_path):
+    root = write_old_results(str(tmp_path))
+    connection, ingested = collect(root)
+    assert ingested == 2
+
+    df = runs(connection, '*_steps')
+    assert len(df) == 12
+    assert sorted(df['time_steps'].unique()) == [100, 300]
+    assert df['n'].isna().all() and df['bound_alpha_factor'].isna().all()
+    assert df['experiment'].str.startswith('grid' + os.sep).all()
+
+    means = summary(connection, by=('reduction', 'time_steps'))
+    assert list(means['runs']) == [3, 3, 3, 3]
+    row = means[~means['reduction'] & (means['time_steps'] == 300)].iloc[0]
+    assert row['objective_mean'] == 300002.0
+
+
+def test_collect_only_changed(tmp_path):
+    root = write_old_results(str(tmp_path))
+    connection, _ = collect(root)
+    connection.close()
+    connection, ingested = collect(root)
+    assert ingested == 0
+
+    path = os.path.join(root, 'grid', 'new-200_steps')
+    os.makedirs(path)
+    pd.DataFrame({'run': [1], 'reduction': [True], 'objective': [1.0], 'runtime': [2.0], 'n': [8],
+                  'time_steps': [200], 'bound_alpha_factor': [1.5]}).to_csv(os.path.join(path, 'results.csv'), index=False)
+    connection, ingested = collect(root)
+    assert ingested == 1
+    new = runs(connection, '*new-200_steps')
+    assert new[['n', 'time_steps', 'bound_alpha_factor']].values.tolist() == [[8, 200, 1.5]]
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# Edge lists of the case study topologies as NumPy index arrays (sources, targets), built without per node loops.
+# Undirected topologies (grid, torus, small world, scale free) return every line once, directional_lines turns them
+# into the (from, to, capacity) rows of transmission_lines2.csv in both directions in one step.
+
+
+def location_names(n, start=0):
+    "l{start} .. l{start + n - 1} as a NumPy string array, to index with the edge arrays"
+    return np.char.add('l', np.arange(start, start + n).astype(str))
+
+
+def grid_edges(rows, columns, torus=False):
+    """
+    lines of a rows x columns grid, locations numbered row by row
+
+    Per location the line to the right comes before the line down, like generate_case_study_grid always did.
+    A torus also connects the last column to the first and the last row to the first (for more than 2 of them,
+    with 2 that line already exists).
+    """
+    index = np.arange(rows * columns).reshape(rows, columns)
+    right = np.roll(index, -1, axis=1)
+    down = np.roll(index, -1, axis=0)
+    has_right = np.ones((rows, columns), dtype=bool)
+    has_down = np.ones((rows, columns), dtype=bool)
+    if not torus or columns <= 2:
+        has_right[:, -1] = False
+    if not torus or rows <= 2:
+        has_down[-1, :] = False
+
+    sources = np.concatenate([index[has_right], index[has_down]])
+    targets = np.concatenate([right[has_right], down[has_down]])
+    kind = np.concatenate([np.zeros(has_right.sum(), dtype=int), np.ones(has_down.sum(), dtype=int)])
+    order = np.lexsort((kind, sources))
+    return sources[order], targets[order]
+
+
+def clique_edges(n, clique_size):
+    """
+    directed lines of n locations in cliques of clique_size: every ordered pair within a clique, and separately
+    every ordered pair of the first locations of the cliques (the connectors between cliques)
+
+    returns (sources, targets) of the clique lines and (sources, targets) of the connector lines
+    """
+    offsets = np.arange(clique_size)
+    a, b = np.meshgrid(offsets, offsets, indexing='ij')
+    pair = a != b
+    starts = np.arange(0, n, clique_size)[:, None]
+    clique_lines = (starts + a[pair]).ravel(), (starts + b[pair]).ravel()
+
+    a, b = np.meshgrid(starts.ravel(), starts.ravel(), indexing='ij')
+    pair = a != b
+    return clique_lines, (a[pair], b[pair])
+
+
+def small_world_edges(n, neighbors, rewiring, rng):
+    """
+    Watts-Strogatz small world: a ring where every location is connected to its neighbors // 2 nearest locations on
+    both sides, after which every line is rewired to a uniformly drawn target with probability rewiring.
+    Rewired lines that became loops or duplicates are dropped.
+    """
+    sources = np.repeat(np.arange(n), neighbors // 2)
+    targets = (sources + np.tile(np.arange(1, neighbors // 2 + 1), n)) % n
+    rewire = rng.random(len(targets)) < rewiring
+    targets = np.where(rewire, rng.integers(0, n, size=len(targets)), targets)
+    return unique_edges(sources, targets)
+
+
+def scale_free_edges(n, m, rng):
+    """
+    Barabasi-Albert scale free graph: every new location connects to m existing locations, chosen with probability
+    proportional to their degree by drawing from the endpoints of all lines so far. Starts from a clique of m + 1.
+    """
+    (sources, targets), _ = clique_edges(m + 1, m + 1)
+    keep = sources < targets
+    endpoints = np.empty(2 * (m * (m + 1) // 2 + m * max(0, n - m - 1)), dtype=np.int64)
+    count = 2 * keep.sum()
+    endpoints[:count:2], endpoints[1:count:2] = sources[keep], targets[keep]
+    new_sources = [sources[keep]]
+    new_targets = [targets[keep]]
+    for location in range(m + 1, n):
+        chosen = endpoints[rng.integers(0, count, size=m)]
+        new_sources.append(np.full(m, location))
+        new_targets.append(chosen)
+        endpoints[count:count + 2 * m:2] = location
+        endpoints[count + 1:count + 2 * m:2] = chosen
+        count += 2 * m
+    return unique_edges(np.concatenate(new_sources), np.concatenate(new_targets))
+
+
+def unique_edges(sources, targets):
+    "drops loops and duplicate (also reversed) lines, keeping the first occurrence in the original order"
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    keep = low != high
+    low, high, sources, targets = low[keep], high[keep], sources[keep], targets[keep]
+    _, first = np.unique(np.column_stack([low, high]), axis=0, return_index=True)
+    first.sort()
+    return sources[first], targets[first]
+
+
+def directional_lines(sources, targets, capacity, names):
+    """
+    (from, to, capacity) frame of transmission_lines2.csv with both directions of every undirected line:
+    first all lines from target to source, then all lines from source to target
+
+    capacity is a scalar or one value per line, names maps location indices to names (see location_names)
+    """
+    capacity = np.broadcast_to(capacity, len(sources))
+    return pd.DataFrame({
+        'from': names[np.concatenate([targets, sources])],
+        'to': names[np.concatenate([sources, targets])],
+        'capacity': np.concatenate([capacity, capacity]),
+    })
+
+
+def bidirectional_lines(sources, targets, export_capacity, import_capacity, names):
+    "(from, to, export_capacity, import_capacity) frame of transmission_lines.csv with every line once"
+    return pd.DataFrame({
+        'from': names[sources],
+        'to': names[targets],
+        'export_capacity': np.broadcast_to(export_capacity, len(sources)),
+        'import_capacity': np.broadcast_to(import_capacity, len(sources)),
+    })
@@ -0,0 +1,309 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import toml
+
+# Checks case study folders before they are handed to main.jl, so a broken instance fails in seconds instead of
+# after loading it into the model. Every input CSV is streamed once in chunks, only the statistics, the sets of
+# locations and technologies and a bitmap of the (location, time_step) cells are kept in memory.
+#
+# Errors are inconsistencies that make run_optimisation fail or give a different model than intended (a missing
+# demand cell, a missing column, a generator that is listed twice), warnings are things that are allowed but usually
+# a mistake (an empty availability file, a transmission graph in several parts, lines to locations without generation).
+#
+#   python scripts/validate_case_study.py [folders...]     (default case_studies, exits with 1 on errors)
+
+DATA_KEYS = ('demand', 'generation_availability', 'generation', 'transmission_lines', 'scalars')
+COLUMNS = {
+    'demand': ['location', 'time_step', 'demand'],
+    'generation_availability': ['location', 'technology', 'time_step', 'availability'],
+    'generation': ['technology', 'location', 'investment_cost', 'variable_cost', 'unit_capacity', 'ramping_rate'],
+    'transmission_lines': ['from', 'to', 'capacity'],
+    'bidirectional_transmission_lines': ['from', 'to', 'export_capacity', 'import_capacity'],
+}
+# (lowest, highest) value that makes sense for every value column
+RANGES = {
+    'demand': (0, np.inf),
+    'availability': (0, 1),
+    'investment_cost': (0, np.inf),
+    'variable_cost': (0, np.inf),
+    'unit_capacity': (0, np.inf),
+    'ramping_rate': (0, 1),
+    'capacity': (0, np.inf),
+    'export_capacity': (0, np.inf),
+    'import_capacity': (0, np.inf),
+}
+EXAMPLES = 5
+
+
+def find_case_studies(roots):
+    "every folder with a config.toml under the root folders, in a fixed order"
+    folders = []
+    for root in roots:
+        for directory, subfolders, files in os.walk(root):
+            subfolders.sort()
+            if 'config.toml' in files:
+                folders.append(directory)
+    return folders
+
+
+def scan_csv(path, columns, cells=None, chunk_size=1_000_000):
+    """
+    streams the CSV at path once and returns its statistics
+
+    inputs:
+        columns:    [list]  the columns the file should have
+        cells:      [dict]  if given, the time steps of every location (and technology, if the file has one) are
+                            marked in it: key -> boolean array indexed by time step, the number of cells that were
+                            already marked is returned as duplicates
+    returns a dict with the rows, the missing columns, per column the number of missing values, per numeric
+    column the (min, max), the unique values of the location, technology, from and to columns and the unique
+    (location, technology) or (from, to) pairs
+    """
+    stats = {'rows': 0, 'missing_columns': [], 'missing_values': {}, 'range': {}, 'unique': {}, 'pairs': set(),
+             'duplicates': 0, 'out_of_range': {}}
+    header = pd.read_csv(path, encoding='utf-8-sig', nrows=0).columns
+    stats['missing_columns'] = [column for column in columns if column not in header]
+    present = [column for column in columns if column in header]
+    if not present:
+        return stats
+
+    for chunk in pd.read_csv(path, encoding='utf-8-sig', usecols=present, chunksize=chunk_size):
+        stats['rows'] += len(chunk)
+        for column in present:
+            values = chunk[column]
+            missing = int(values.isna().sum())
+            if missing:
+                stats['missing_values'][column] = stats['missing_values'].get(column, 0) + missing
+            if column in ('location', 'technology', 'from', 'to'):
+                stats['unique'].setdefault(column, set()).update(values.dropna().astype(str).unique())
+            elif len(values.dropna()):
+                low, high = stats['range'].get(column, (np.inf, -np.inf))
+                stats['range'][column] = (min(low, values.min()), max(high, values.max()))
+                if column in RANGES:
+                    outside = int(((values < RANGES[column][0]) | (values > RANGES[column][1])).sum())
+                    if outside:
+                        stats['out_of_range'][column] = stats['out_of_range'].get(column, 0) + outside
+        for a, b in (('location', 'technology'), ('from', 'to')):
+            if a in present and b in present:
+                pairs = chunk[[a, b]].drop_duplicates().astype(str)
+                stats['pairs'].update(zip(pairs[a], pairs[b]))
+        if cells is not None and 'location' in present and 'time_step' in present:
+            keys = [column for column in ('location', 'technology') if column in present]
+            stats['duplicates'] += _mark_cells(cells, chunk.dropna(subset=[*keys, 'time_step']), keys)
+    return stats
+
+
+def _mark_cells(cells, chunk, keys):
+    "marks the (*keys, time_step) cells of the chunk in the bitmaps, returns how many were already marked"
+    duplicates = 0
+    time_steps = chunk['time_step'].to_numpy(dtype=np.int64)
+    time_steps = np.where(time_steps < 0, 0, time_steps)
+    groups = chunk[keys].astype(str).groupby(keys, sort=False).indices
+    for key, rows in groups.items():
+        steps = time_steps[rows]
+        bitmap = cells.get(key, np.zeros(0, dtype=bool))
+        if len(bitmap) <= steps.max():
+            bitmap = np.pad(bitmap, (0, steps.max() + 1 - len(bitmap)))
+        # every row is a duplicate, except the first of every time step that was not marked yet
+        new = np.flatnonzero(np.bincount(steps))
+        duplicates += len(steps) - int(np.count_nonzero(~bitmap[new]))
+        bitmap[steps] = True
+        cells[key] = bitmap
+    return duplicates
+
+
+def count_components(locations, lines):
+    "number of connected parts of the transmission graph, by union-find with path halving over the lines"
+    index = {location: i for i, location in enumerate(locations)}
+    parent = list(range(len(index)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in lines:
+        if a in index and b in index:
+            parent[find(index[a])] = find(index[b])
+    return len({find(i) for i in range(len(parent))})
+
+
+def flatten_clusters(clusters):
+    "the locations in a (nested) cluster tree of the config"
+    if isinstance(clusters, list):
+        return [location for cluster in clusters for location in flatten_clusters(cluster)]
+    return [clusters]
+
+
+def validate_case_study(folder, chunk_size=1_000_000):
+    """
+    checks the case study in folder and collects the statistics of its input files
+
+    returns a report dict with the folder, a list of errors, a list of warnings and the statistics per file
+    """
+    report = {'case_study': folder, 'errors': [], 'warnings': [], 'files': {}}
+    errors, warnings = report['errors'], report['warnings']
+
+    try:
+        config = toml.load(os.path.join(folder, 'config.toml'))
+        data_config = config['input']['data']
+        sets_config = config['input']['sets']
+    except (toml.TomlDecodeError, KeyError) as e:
+        errors.append(f'config.toml can not be read: {e!r}')
+        return report
+    input_folder = os.path.join(folder, data_config.get('dir', ''))
+
+    paths = {}
+    for key in DATA_KEYS:
+        if key not in data_config:
+            errors.append(f'config.toml has no input.data.{key}')
+        elif not os.path.exists(os.path.join(input_folder, data_config[key])):
+            errors.append(f'{key} file {data_config[key]} does not exist')
+        elif key != 'scalars':
+            paths[key] = os.path.join(input_folder, data_config[key])
+    for key, path in paths.items():
+        if not path.endswith('.csv'):
+            warnings.append(f'{key} file {data_config[key]} is not a CSV, not checked')
+    paths = {key: path for key, path in paths.items() if path.endswith('.csv')}
+    if 'line_capacities_bidirectional' not in data_config:
+        errors.append('config.toml has no input.data.line_capacities_bidirectional')
+    if 'clusters' not in data_config:
+        warnings.append('config.toml has no cluster tree (input.data.clusters), only the full model can be solved')
+
+    # one pass over every file
+    demand_cells, availability_cells = {}, {}
+    stats = {}
+    for key, path in paths.items():
+        columns = COLUMNS[key]
+        if key == 'transmission_lines' and data_config.get('line_capacities_bidirectional', False):
+            columns = COLUMNS['bidirectional_transmission_lines']
+        cells = demand_cells if key == 'demand' else availability_cells if key == 'generation_availability' else None
+        stats[key] = scan_csv(path, columns, cells, chunk_size)
+        s = stats[key]
+        if s['missing_columns']:
+            errors.append(f'{data_config[key]} misses the columns {s["missing_columns"]}')
+        if s['rows'] == 0:
+            (warnings if key == 'generation_availability' else errors).append(f'{data_config[key]} is empty')
+        for column, missing in s['missing_values'].items():
+            errors.append(f'{data_config[key]} has {missing} empty {column} cells')
+        for column, outside in s['out_of_range'].items():
+            warnings.append(f'{data_config[key]} has {outside} {column} values outside {list(RANGES[column])}')
+        if s['duplicates']:
+            message = f'{data_config[key]} has {s["duplicates"]} duplicate (location, time_step) rows'
+            (errors if key == 'demand' else warnings).append(message)
+        report['files'][data_config[key]] = {
+            'rows': s['rows'],
+            'range': {column: [float(low), float(high)] for column, (low, high) in s['range'].items()},
+            'unique': {column: len(values) for column, values in s['unique'].items()},
+        }
+    # the cross file checks need every file with all its columns
+    if len(paths) < len(DATA_KEYS) - 1 or any(s['missing_columns'] for s in stats.values()):
+        return report
+
+    # the sets the model is built on, resolved like read_config does
+    def unique(key, column):
+        return stats[key]['unique'].get(column, set())
+
+    if sets_config.get('time_steps', 'auto') == 'auto':
+        ranges = [stats[key]['range']['time_step'] for key in ('demand', 'generation_availability')
+                  if 'time_step' in stats[key]['range']]
+        time_steps = np.arange(int(min(low for low, _ in ranges)), int(max(high for _, high in ranges)) + 1)
+    else:
+        time_steps = np.asarray(sets_config['time_steps'], dtype=np.int64)
+    if sets_config.get('locations', 'auto') == 'auto':
+        locations = sorted(unique('demand', 'location') | unique('generation_availability', 'location')
+                           | unique('generation', 'location') | unique('transmission_lines', 'from')
+                           | unique('transmission_lines', 'to'))
+    else:
+        locations = sorted(map(str, sets_config['locations']))
+    report['locations'] = len(locations)
+    report['time_steps'] = [int(time_steps.min()), int(time_steps.max())] if len(time_steps) else []
+
+    ranges = {key: stats[key]['range'].get('time_step') for key in ('demand', 'generation_availability')}
+    if ranges['generation_availability'] and ranges['demand'] != ranges['generation_availability']:
+        warnings.append(f'demand covers time steps {list(map(int, ranges["demand"]))} but the availability '
+                        f'{list(map(int, ranges["generation_availability"]))}')
+
+    # every location needs a demand in every time step
+    missing = []
+    for location in locations:
+        bitmap = demand_cells.get(location, np.zeros(0, dtype=bool))
+        covered = np.zeros(len(time_steps), dtype=bool)
+        inside = (time_steps >= 0) & (time_steps < len(bitmap))
+        covered[inside] = bitmap[time_steps[inside]]
+        if not covered.all():
+            missing.append((location, int((~covered).sum()), int(time_steps[~covered][0])))
+    if missing:
+        examples = ', '.join(f'{location} ({count} from time step {first})' for location, count, first in missing[:EXAMPLES])
+        errors.append(f'{sum(count for _, count, _ in missing)} (location, time_step) demand cells are missing: {examples}')
+
+    # availability is optional (1.0 when missing) but should only be given for generators
+    generators = stats['generation']['pairs']
+    if len(generators) < stats['generation']['rows']:
+        errors.append(f'{stats["generation"]["rows"] - len(generators)} generators are listed more than once in '
+                      f'{data_config["generation"]}')
+    unused = stats['generation_availability']['pairs'] - generators
+    if unused:
+        warnings.append(f'{len(unused)} (location, technology) availability profiles have no generator, '
+                        f'e.g. {sorted(unused)[:EXAMPLES]}')
+
+    endpoints = unique('transmission_lines', 'from') | unique('transmission_lines', 'to')
+    outside = endpoints - set(locations)
+    if outside:
+        errors.append(f'transmission lines reference {len(outside)} locations outside the location set, '
+                      f'e.g. {sorted(outside)[:EXAMPLES]}')
+    without_generation = endpoints - unique('generation', 'location')
+    if without_generation:
+        warnings.append(f'transmission lines reference {len(without_generation)} locations without generation, '
+                        f'e.g. {sorted(without_generation)[:EXAMPLES]}')
+
+    lines = stats['transmission_lines']['pairs']
+    loops = sum(a == b for a, b in lines)
+    if loops:
+        warnings.append(f'{loops} transmission lines start and end in the same location')
+    report['components'] = count_components(locations, lines)
+    if report['components'] > 1:
+        warnings.append(f'the transmission graph has {report["components"]} separate parts')
+
+    if 'clusters' in data_config:
+        clustered = flatten_clusters(data_config['clusters'])
+        if len(clustered) != len(set(clustered)):
+            errors.append('the cluster tree contains locations more than once')
+        if set(clustered) != set(locations):
+            errors.append(f'the cluster tree does not match the locations: {len(set(locations) - set(clustered))} '
+                          f'missing, {len(set(clustered) - set(locations))} unknown')
+    return report
+
+
+def validate_tree(roots=('case_studies',), workers=None, output=None):
+    """
+    validates every case study under the root folders in parallel and prints its errors and warnings
+
+    output is an optional JSON file for the reports, returns the reports
+    """
+    folders = find_case_studies(roots)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(validate_case_study, folders))
+    for report in reports:
+        status = 'ERROR' if report['errors'] else 'warning' if report['warnings'] else 'ok'
+        print(f"{status:8} {report['case_study']}")
+        for message in report['errors']:
+            print(f'    error: {message}')
+        for message in report['warnings']:
+            print(f'    warning: {message}')
+    print(f"{len(reports)} case studies, {sum(bool(report['errors']) for report in reports)} with errors")
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+if __name__ == '__main__':
+    reports = validate_tree(sys.argv[1:] or ['case_studies'])
+    sys.exit(1 if any(report['errors'] for report in reports) else 0)